@@ -1,20 +1,50 @@
 from setuptools import setup
+from setuptools.command.build_ext import build_ext
+import os
+import ast
+import hashlib
 
 def find_version():
-    import os
     with open(os.path.join("tilemapbase", "__init__.py")) as file:
-        for line in file:
-            if line.startswith("__version__"):
-                start = line.index('"')
-                end = line[start+1:].index('"')
-                return line[start+1:][:end]
+        tree = ast.parse(file.read())
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and any(isinstance(t, ast.Name)
+                and t.id == "__version__" for t in node.targets):
+            return ast.literal_eval(node.value)
 
-try:
-    import pypandoc
-    pypandoc.convert_file("readme.md", "rst", outputfile="README.rst")
-except Exception as ex:
-    print("NOT REFRESHING README.rst")
-    print("Exception was", ex)
+class ParallelBuildExt(build_ext):
+    """Build any extension modules in parallel; honours `MAX_JOBS`."""
+    def initialize_options(self):
+        super().initialize_options()
+        self.parallel = int(os.environ.get("MAX_JOBS", os.cpu_count() or 1))
+
+def readme_needs_refresh():
+    """Compare a hash of `readme.md` against the one stored when `README.rst`
+    was last generated.
+
+    :return: Pair `(needs_refresh, hash)`
+    """
+    with open("readme.md", "rb") as f:
+        digest = hashlib.sha256(f.read()).hexdigest()
+    if not os.path.exists("README.rst"):
+        return True, digest
+    try:
+        with open(".readme.hash") as f:
+            return f.read().strip() != digest, digest
+    except OSError:
+        return True, digest
+
+if not os.environ.get("TILEMAPBASE_SKIP_PANDOC"):
+    try:
+        refresh, digest = readme_needs_refresh()
+        if refresh:
+            import pypandoc
+            pypandoc.convert_file("readme.md", "rst", outputfile="README.rst")
+            with open(".readme.hash", "w") as f:
+                f.write(digest)
+    except Exception as ex:
+        print("NOT REFRESHING README.rst")
+        print("Exception was", ex)
 
 with open('README.rst', encoding='utf-8') as f:
     long_description = f.read()
@@ -23,6 +53,7 @@ setup(
     name = 'tilemapbase',
     packages = ['tilemapbase'],
     version = find_version(),
+    cmdclass = {"build_ext": ParallelBuildExt},
     install_requires = ['requests', 'pillow'],
     python_requires = '>=3.6',
     description = 'Use OpenStreetMap tiles as basemaps in python / matplotlib',
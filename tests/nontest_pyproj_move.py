@@ -5,41 +5,42 @@ from pyproj 1 to pyproj 2+
 """
 
 import pyproj
-import random
+import numpy as np
+import functools
 
-def sqrt_diff(p1, p2):
-    return (p1[0] - p2[0])**2 + (p1[1] - p2[1])**2
+@functools.lru_cache(maxsize=16)
+def _cached_proj(init):
+    return pyproj.Proj(init=init)
+
+@functools.lru_cache(maxsize=16)
+def _cached_transformer(src_epsg, dst_epsg):
+    return pyproj.Transformer.from_crs(pyproj.CRS(src_epsg), pyproj.CRS(dst_epsg), always_xy=True).transform
 
 def test_to_web_mercator():
-    p3857 = pyproj.Proj({"init": "epsg:3857"})
-    p3785 = pyproj.Proj({"init": "epsg:3785"})
-
-    #crs_4326 = pyproj.CRS("WGS84")
-    crs_4326 = pyproj.CRS("epsg:4326")
-    crs_3857 = pyproj.CRS("epsg:3857")
-    crs_3785 = pyproj.CRS("epsg:3785")
-    t1 = pyproj.Transformer.from_crs(crs_4326, crs_3857).transform
-    t2 = pyproj.Transformer.from_crs(crs_4326, crs_3785).transform
-
-    for _ in range(10000):
-        x = random.random() * 360 - 180
-        y = random.random() * 170 - 85
-        assert( p3857(x, y) == p3785(x, y) )
-        #assert( p3857(x, y) == t1(y, x) )
-        assert( sqrt_diff(p3857(x, y), t1(y, x)) < 1e-16 )
-        #assert( p3785(x, y) == t2(y, x) )
-        assert( sqrt_diff(p3785(x, y), t2(y, x)) < 1e-16 )
+    p3857 = _cached_proj("epsg:3857")
+    p3785 = _cached_proj("epsg:3785")
+
+    t1 = _cached_transformer("epsg:4326", "epsg:3857")
+    t2 = _cached_transformer("epsg:4326", "epsg:3785")
+
+    xs = np.random.random(10000) * 360 - 180
+    ys = np.random.random(10000) * 170 - 85
+    x1, y1 = p3857(xs, ys)
+    x2, y2 = p3785(xs, ys)
+    assert( np.array_equal(x1, x2) and np.array_equal(y1, y2) )
+    x3, y3 = t1(xs, ys)
+    assert( np.allclose(x1, x3, atol=1e-8) and np.allclose(y1, y3, atol=1e-8) )
+    x4, y4 = t2(xs, ys)
+    assert( np.allclose(x2, x4, atol=1e-8) and np.allclose(y2, y4, atol=1e-8) )
 
 def test_to_bng():
-    crs_4326 = pyproj.CRS("epsg:4326")
-    bng = pyproj.Proj(init="epsg:27700")
-    wgs84 = pyproj.Proj(init="epsg:4326")    
+    bng = _cached_proj("epsg:27700")
+    wgs84 = _cached_proj("epsg:4326")
     def project(lon, lat):
         return pyproj.transform(wgs84, bng, lon, lat)
 
-    bng_new = pyproj.CRS("epsg:27700")
-    project2 = pyproj.Transformer.from_crs(crs_4326, bng_new).transform
+    project2 = _cached_transformer("epsg:4326", "epsg:27700")
 
-    assert( project(-1.55532, 53.80474) == project2(53.80474, -1.55532) )
-    assert( project(-5.71808, 50.06942) == project2(50.06942, -5.71808) )
-    assert( project(-3.02516, 58.64389) == project2(58.64389, -3.02516) )
+    assert( project(-1.55532, 53.80474) == project2(-1.55532, 53.80474) )
+    assert( project(-5.71808, 50.06942) == project2(-5.71808, 50.06942) )
+    assert( project(-3.02516, 58.64389) == project2(-3.02516, 58.64389) )
@@ -1,22 +1,9 @@
 import pytest
 import unittest.mock as mock
-import datetime, sqlite3, os, threading
+import datetime, sqlite3, threading, time
 
 import tilemapbase.cache as cache
 
-class CacheTest(cache.ConcreteCache):
-    def __init__(self):
-        self.get = None
-        self.gets = []
-        self.placed = []
-
-    def get_from_cache(self, str_request):
-        self.gets.append(str_request)
-        return self.get
-
-    def place_in_cache(self, str_request, obj_as_bytes):
-        self.placed.append((str_request, obj_as_bytes))
-
 @pytest.fixture()
 def cache_test():
     executor = mock.MagicMock()
@@ -45,74 +32,304 @@ def test_Cache_inCacheDoesntRequest(cache_test):
     assert( obj == expected_obj )
     assert( executor.fetch.call_count == 0 )
 
-def test_Cache_withTimeout(cache_test):
+def test_Cache_remembers_in_memory(cache_test):
+    c, executor, ccache, expected_obj = cache_test
+    assert c.fetch("spam") == expected_obj
+    assert c.fetch("spam") == expected_obj
+    assert executor.fetch.call_count == 1
+    assert ccache.get_from_cache.call_count == 1
+
+    ccache.get_from_cache.return_value = (b"eggs", None)
+    assert c.fetch("ham") == b"eggs"
+    assert c.fetch("ham") == b"eggs"
+    assert ccache.get_from_cache.call_count == 2
+
+def test_Cache_memory_disabled(cache_test):
+    c, executor, ccache, expected_obj = cache_test
+    c.memory_size = 0
+    ccache.get_from_cache.return_value = (b"eggs", None)
+    assert c.fetch("ham") == b"eggs"
+    assert c.fetch("ham") == b"eggs"
+    assert ccache.get_from_cache.call_count == 2
+
+def test_Cache_memory_forgets_removed(cache_test):
+    c, executor, ccache, expected_obj = cache_test
+    ccache.removal_count = 0
+    c.memory_size = 8
+    ccache.get_from_cache.return_value = (b"eggs", None)
+    assert c.fetch("ham") == b"eggs"
+    assert c.fetch("ham") == b"eggs"
+    assert ccache.get_from_cache.call_count == 1
+
+    ccache.removal_count = 1
+    ccache.get_from_cache.return_value = None
+    assert c.fetch("ham") == expected_obj
+    assert ccache.get_from_cache.call_count == 2
+
+def test_Cache_memory_with_sqcache(tmp_path):
+    sqcache = cache.SQLiteCache(str(tmp_path / "test.db"))
+    try:
+        executor = mock.MagicMock()
+        executor.fetch.side_effect = [b"eggs", b"new eggs"]
+        c = cache.Cache(executor, sqcache)
+        assert c.fetch("spam") == b"eggs"
+        assert c.fetch("spam") == b"eggs"
+        sqcache.remove_many(["spam"])
+        assert c.fetch("spam") == b"new eggs"
+    finally:
+        sqcache.close()
+
+def test_Cache_fetch_many(cache_test):
+    c, executor, ccache, expected_obj = cache_test
+    ccache.get_many.return_value = {"spam" : (b"eggs", None)}
+    executor.fetch.side_effect = lambda request : request.encode()
+
+    assert c.fetch_many(["spam", "ham", "spam", "ham"]) == [b"eggs", b"ham", b"eggs", b"ham"]
+    assert list(ccache.get_many.call_args[0][0]) == ["spam", "ham"]
+    executor.fetch.assert_called_once_with("ham")
+    ccache.place_in_cache.assert_called_once_with("ham", b"ham")
+
+@pytest.fixture
+def frozen_now(monkeypatch):
+    """Replace `datetime.datetime` so that `now()` returns the `frozen`
+    attribute of the returned class."""
+    class FrozenDateTime(datetime.datetime):
+        frozen = datetime.datetime(2016,4,10,12,30)
+
+        @classmethod
+        def now(cls, tz=None):
+            return cls.frozen
+
+    monkeypatch.setattr(datetime, "datetime", FrozenDateTime)
+    return FrozenDateTime
+
+def test_Cache_withTimeout(cache_test, frozen_now):
     c, executor, ccache, expected_obj = cache_test
     c.expire_time = datetime.timedelta(days=1)
-    now = datetime.datetime(2016,4,10,12,30)
+    now = frozen_now.frozen
     ccache.get_from_cache.return_value = (expected_obj, now)
     
-    with mock.patch("datetime.datetime") as datetime_mock:
-        datetime_mock.now.return_value = now
-        obj = c.fetch("spam")
-        assert( executor.fetch.call_count == 0 )
-        assert( obj == expected_obj )
+    obj = c.fetch("spam")
+    assert( executor.fetch.call_count == 0 )
+    assert( obj == expected_obj )
 
-def test_Cache_withTimeout_doesExpire(cache_test):
+def test_Cache_withTimeout_doesExpire(cache_test, frozen_now):
     c, executor, ccache, expected_obj = cache_test
     c.expire_time = datetime.timedelta(days=1)
-    now = datetime.datetime(2016,4,10,12,30)
+    now = frozen_now.frozen
     ccache.get_from_cache.return_value = (expected_obj, now)
     
-    with mock.patch("datetime.datetime") as datetime_mock:
-        datetime_mock.now.return_value = now + datetime.timedelta(days=1, minutes=1)
-        obj = c.fetch("spam")
-        executor.fetch.assert_called_with("spam")
-        ccache.place_in_cache.assert_called_with("spam", expected_obj)
+    frozen_now.frozen = now + datetime.timedelta(days=1, minutes=1)
+    obj = c.fetch("spam")
+    executor.fetch.assert_called_with("spam")
+    ccache.place_in_cache.assert_called_with("spam", expected_obj)
 
 
+@pytest.fixture(scope="module")
+def db_cache_module(tmp_path_factory):
+    c = cache.SQLiteCache(str(tmp_path_factory.mktemp("cache") / "test.db"))
+    c._writer_connection().execute("PRAGMA synchronous=OFF")
+    try:
+        yield c
+    finally:
+        c.close()
+
+@pytest.fixture
+def db_cache(db_cache_module):
+    yield db_cache_module
+    db_cache_module.flush()
+    with db_cache_module._writer_connection() as conn:
+        conn.execute("DELETE FROM cache")
+
 @pytest.fixture
-def db_cache():
+def bulk_place(db_cache):
+    """Insert many `(request, data)` pairs in one transaction, for test set-up.
+    """
+    def place(pairs):
+        now = int(datetime.datetime.now().timestamp())
+        with db_cache._writer_connection() as conn:
+            conn.executemany(db_cache._INSERT,
+                [(cache._request_hash(name), name, data, now, 0) for name, data in pairs])
+    return place
+
+def test_database_exists(tmp_path):
+    filename = str(tmp_path / "test.db")
+    assert( cache.database_exists(filename) == False )
+
+    sqlite3.connect(filename, isolation_level=None).close()
+    assert( cache.database_exists(filename) == False )
+
+    conn = sqlite3.connect(filename, isolation_level=None)
+    conn.execute("CREATE table cache (name)")
+    conn.execute("CREATE table other (thing)")
+    conn.close()
+    assert( cache.database_exists(filename) == True )
+
+def test_database_exists_is_remembered(tmp_path):
+    filename = str(tmp_path / "test.db")
+    conn = sqlite3.connect(filename)
+    conn.execute("CREATE table cache (name)")
+    conn.close()
+
+    with mock.patch.object(cache._sqlite3, "connect", wraps=sqlite3.connect) as connect:
+        assert cache.database_exists(filename) == True
+        assert cache.database_exists(filename) == True
+        assert connect.call_count == 1
+
+def test_sqcache_connection_pragmas(tmp_path):
+    c = cache.SQLiteCache(str(tmp_path / "test.db"))
+    try:
+        conn = c._writer_connection()
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1
+        with c._reader() as conn:
+            assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1
+            assert conn.execute("PRAGMA query_only").fetchone()[0] == 1
+    finally:
+        c.close()
+
+def test_sqcache_migrates_iso_times(tmp_path):
+    filename = str(tmp_path / "test.db")
+    conn = sqlite3.connect(filename)
+    with conn:
+        conn.execute("CREATE table cache (request STRING UNIQUE, data BLOB, create_time STRING)")
+        conn.execute("INSERT INTO cache VALUES ('spam', x'01', '2016-04-10T12:30:00')")
+    conn.close()
+
+    c = cache.SQLiteCache(filename)
     try:
-        c = cache.SQLiteCache("test.db")
+        assert c.get_from_cache("spam") == (b"\x01", datetime.datetime(2016,4,10,12,30))
+        conn = c._writer_connection()
+        assert conn.execute("SELECT typeof(create_time) FROM cache").fetchone()[0] == "integer"
+        assert conn.execute("SELECT id FROM cache").fetchone()[0] == cache._request_hash("spam")
+    finally:
+        c.close()
+
+class _Py37Connection():
+    """Wraps a connection, but with the `create_function` signature of Python
+    3.7 and older, which has no `deterministic` argument."""
+    def __init__(self, conn):
+        self._conn = conn
+
+    def create_function(self, name, num_params, func):
+        return self._conn.create_function(name, num_params, func)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+def _old_schema_database(filename, version):
+    conn = sqlite3.connect(filename)
+    with conn:
+        if version == 1:
+            conn.execute("CREATE table cache (request STRING UNIQUE, data BLOB, create_time INTEGER)")
+            conn.execute("INSERT INTO cache VALUES ('spam', x'01', 1460291400)")
+        else:
+            conn.execute("CREATE table cache (id INTEGER PRIMARY KEY, request TEXT, "
+                "data BLOB, create_time INTEGER)")
+            conn.execute("INSERT INTO cache VALUES (?, 'spam', x'01', 1460291400)",
+                (cache._request_hash("spam"),))
+    conn.execute("PRAGMA user_version={}".format(version))
+    conn.close()
+
+@pytest.mark.parametrize("version", [1, 2])
+def test_sqcache_migrates_old_schemas(tmp_path, version):
+    filename = str(tmp_path / "test.db")
+    _old_schema_database(filename, version)
+
+    connect = sqlite3.connect
+    with mock.patch("sqlite3.connect", lambda *a, **k : _Py37Connection(connect(*a, **k))):
+        cache.SQLiteCache(filename).close()
+
+    c = cache.SQLiteCache(filename)
+    try:
+        expected = datetime.datetime.fromtimestamp(1460291400)
+        assert c.get_from_cache("spam") == (b"\x01", expected)
+        conn = c._writer_connection()
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == cache.SQLiteCache._SCHEMA_VERSION
+        assert conn.execute("SELECT id, codec FROM cache").fetchone() == (cache._request_hash("spam"), 0)
+    finally:
+        c.close()
+
+def test_sqcache_migration_is_atomic(tmp_path, monkeypatch):
+    filename = str(tmp_path / "test.db")
+    _old_schema_database(filename, 1)
+    def schema():
+        conn = sqlite3.connect(filename)
         try:
-            yield c
+            tables = [n for n, in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")]
+            return sorted(tables), conn.execute("PRAGMA user_version").fetchone()[0]
         finally:
-            c.close()
+            conn.close()
+
+    def failing_hash(str_request):
+        raise RuntimeError()
+    monkeypatch.setattr(cache, "_request_hash", failing_hash)
+    with pytest.raises(sqlite3.OperationalError):
+        cache.SQLiteCache(filename)
+    assert schema() == (["cache"], 1)
+    monkeypatch.undo()
+
+    # As left by an interrupted migration which did not run in a transaction
+    conn = sqlite3.connect(filename)
+    conn.execute("CREATE table cache_new (id INTEGER PRIMARY KEY)")
+    conn.close()
+    cache.SQLiteCache(filename).close()
+    assert schema() == (["cache"], cache.SQLiteCache._SCHEMA_VERSION)
+
+def test_sqcache_stores_raw_by_default(tmp_path):
+    filename = str(tmp_path / "test.db")
+    c = cache.SQLiteCache(filename)
+    try:
+        c.place_in_cache("spam", b"eggs" * 1000)
+        c.flush()
+        conn = sqlite3.connect(filename)
+        assert conn.execute("SELECT codec, length(data) FROM cache").fetchone() == (0, 4000)
+        conn.close()
     finally:
-        try:
-            os.remove("test.db")
-        except Exception:
-            pass
+        c.close()
 
-def test_database_exists():
+def test_sqcache_compresses(tmp_path):
+    filename = str(tmp_path / "test.db")
+    c = cache.SQLiteCache(filename, compress=True)
     try:
-        assert( cache.database_exists("test.db") == False )
+        c.place_in_cache("spam", b"eggs" * 1000)
+        c.place_in_cache("spam1", b"eggs")
+        c.flush()
+        conn = sqlite3.connect(filename)
+        rows = dict(conn.execute("SELECT request, codec FROM cache"))
+        conn.close()
+        assert rows["spam"] != 0
+        assert rows["spam1"] == 0
 
-        sqlite3.connect("test.db")
-        assert( cache.database_exists("test.db") == False )
+        c.close()
+        assert c.get_from_cache("spam")[0] == b"eggs" * 1000
+        assert c.get_many(["spam", "spam1"])["spam"][0] == b"eggs" * 1000
+        c.close()
 
-        conn = sqlite3.connect("test.db")
-        conn.execute("CREATE table cache (name)")
-        conn.execute("CREATE table other (thing)")
-        conn.close()
-        assert( cache.database_exists("test.db") == True )
+        # Compressed rows are still read back with compression turned off
+        c = cache.SQLiteCache(filename)
+        assert c.get_from_cache("spam")[0] == b"eggs" * 1000
     finally:
-        os.remove("test.db")
+        c.close()
 
-def test_sqcache_emplace(db_cache):
+def test_sqcache_emplace(db_cache, frozen_now):
     assert(db_cache.get_from_cache("spam") is None)
 
-    now = datetime.datetime(2016,4,10,12,30)
-    strftime = datetime.datetime.strftime
-    strptime = datetime.datetime.strptime
-    with mock.patch("datetime.datetime") as datetime_mock:
-        datetime_mock.now.return_value = now
-        datetime_mock.strftime = strftime
-        datetime_mock.strptime = strptime
-        db_cache.place_in_cache("spam", b"eggs")
-        db_cache.place_in_cache("spam1", b"eggs1")
-        assert(db_cache.get_from_cache("spam") == (b"eggs", now))
-        assert(db_cache.get_from_cache("spam1") == (b"eggs1", now))
+    now = frozen_now.frozen
+    db_cache.place_in_cache("spam", b"eggs")
+    db_cache.place_in_cache("spam1", b"eggs1")
+    assert(db_cache.get_from_cache("spam") == (b"eggs", now))
+    assert(db_cache.get_from_cache("spam1") == (b"eggs1", now))
+
+def test_sqcache_get_many(db_cache, bulk_place, frozen_now):
+    bulk_place([("spam{}".format(i), bytes([i % 256])) for i in range(1200)])
+    db_cache.place_in_cache("pending", b"eggs")
+
+    names = ["spam{}".format(i) for i in range(0, 1200, 2)] + ["pending", "missing"]
+    found = db_cache.get_many(names)
+    assert set(found) == set(names) - {"missing"}
+    assert found["spam1198"] == (bytes([1198 % 256]), frozen_now.frozen)
+    assert found["pending"] == (b"eggs", frozen_now.frozen)
 
 def test_sqcache_query(db_cache):
     assert db_cache.query() == []
@@ -130,6 +347,14 @@ def test_sqcache_query(db_cache):
     assert len(q) == 2
     assert set(name for name, _ in q) == {"spam", "spam1"}
 
+def test_sqcache_iter_query(db_cache, bulk_place):
+    bulk_place([("spam", b"eggs"), ("spam1", b"eggs")])
+    db_cache.place_in_cache("spam2", b"eggs")
+
+    it = db_cache.iter_query()
+    assert not isinstance(it, list)
+    assert set(name for name, _ in it) == {"spam", "spam1", "spam2"}
+
 def test_sqcache_update(db_cache):
     db_cache.place_in_cache("spam", b"eggs")
     q = db_cache.query()
@@ -141,9 +366,8 @@ def test_sqcache_update(db_cache):
     assert len(q) == 1
     assert q[0][0] == "spam"
 
-def test_sqcache_remove(db_cache):
-    db_cache.place_in_cache("spam", b"eggs")
-    db_cache.place_in_cache("spam1", b"eggs")
+def test_sqcache_remove(db_cache, bulk_place):
+    bulk_place([("spam", b"eggs"), ("spam1", b"eggs")])
     assert len(db_cache.query()) == 2
 
     db_cache.remove("spam")
@@ -151,8 +375,177 @@ def test_sqcache_remove(db_cache):
     assert len(q) == 1
     assert q[0][0] == "spam1"
 
-def test_sqcache_multi_threading(db_cache):
+def test_sqcache_buffers_writes(tmp_path):
+    filename = str(tmp_path / "test.db")
+    c = cache.SQLiteCache(filename, batch_size=3, flush_interval=60)
+    def rows_on_disk():
+        conn = sqlite3.connect(filename)
+        try:
+            return conn.execute("SELECT count(*) FROM cache").fetchone()[0]
+        finally:
+            conn.close()
+
+    try:
+        c.place_in_cache("spam", b"eggs")
+        c.place_in_cache("spam1", b"eggs1")
+        assert rows_on_disk() == 0
+        assert c.get_from_cache("spam")[0] == b"eggs"
+
+        c.place_in_cache("spam2", b"eggs2")
+        assert rows_on_disk() == 3
+
+        c.place_in_cache("spam3", b"eggs3")
+        c.flush()
+        assert rows_on_disk() == 4
+    finally:
+        c.close()
+
+def test_sqcache_flushes_when_collected(tmp_path):
+    filename = str(tmp_path / "test.db")
+    c = cache.SQLiteCache(filename, flush_interval=60)
+    c.place_in_cache("a", b"eggs")
+    del c
+
+    c = cache.SQLiteCache(filename)
+    try:
+        assert c.get_from_cache("a")[0] == b"eggs"
+    finally:
+        c.close()
+
+def test_sqcache_flushes_after_interval(tmp_path):
+    filename = str(tmp_path / "test.db")
+    c = cache.SQLiteCache(filename, flush_interval=0.05)
+    other = cache.SQLiteCache(filename)
+    try:
+        c.place_in_cache("a", b"eggs")
+        assert other.get_from_cache("a") is None
+        for _ in range(100):
+            if other.get_from_cache("a") is not None:
+                break
+            time.sleep(0.05)
+        assert other.get_from_cache("a")[0] == b"eggs"
+    finally:
+        c.close()
+        other.close()
+
+def test_sqcache_transaction(tmp_path):
+    filename = str(tmp_path / "test.db")
+    c = cache.SQLiteCache(filename, batch_size=2, flush_interval=60)
+    def rows_on_disk():
+        conn = sqlite3.connect(filename)
+        try:
+            return conn.execute("SELECT count(*) FROM cache").fetchone()[0]
+        finally:
+            conn.close()
+
+    try:
+        with c.transaction():
+            with c.transaction():
+                for i in range(5):
+                    c.place_in_cache("spam{}".format(i), b"eggs")
+            assert rows_on_disk() == 0
+            assert c.get_from_cache("spam4")[0] == b"eggs"
+        assert rows_on_disk() == 5
+    finally:
+        c.close()
+
+def test_sqcache_transaction_isolated_from_other_threads(tmp_path):
+    filename = str(tmp_path / "test.db")
+    c = cache.SQLiteCache(filename, batch_size=2, flush_interval=60)
+    def on_disk():
+        conn = sqlite3.connect(filename)
+        try:
+            return set(r for r, in conn.execute("SELECT request FROM cache"))
+        finally:
+            conn.close()
+
+    in_block, other_done = threading.Event(), threading.Event()
+    seen = []
+    def other():
+        try:
+            in_block.wait(10)
+            # Reaches the batch size, so flushes
+            for i in range(3):
+                c.place_in_cache("other{}".format(i), b"eggs")
+            seen.append(c.get_from_cache("mine0"))
+        finally:
+            other_done.set()
+
+    try:
+        thread = threading.Thread(target=other)
+        thread.start()
+        with c.transaction():
+            c.place_in_cache("mine0", b"eggs")
+            c.place_in_cache("mine1", b"eggs")
+            in_block.set()
+            assert other_done.wait(10)
+            assert seen == [None]
+            assert on_disk() == {"other0", "other1"}
+            assert c.get_from_cache("mine1")[0] == b"eggs"
+            assert set(c.get_many(["mine0", "other2"])) == {"mine0", "other2"}
+        thread.join()
+        assert {"mine0", "mine1"} <= on_disk()
+    finally:
+        c.close()
+
+def test_sqcache_transaction_discarded_on_error(tmp_path):
+    filename = str(tmp_path / "test.db")
+    c = cache.SQLiteCache(filename, batch_size=1, flush_interval=60)
+    try:
+        with pytest.raises(RuntimeError):
+            with c.transaction():
+                c.place_in_cache("spam", b"eggs")
+                raise RuntimeError()
+        assert c.get_from_cache("spam") is None
+
+        with c.transaction():
+            c.place_in_cache("outer", b"eggs")
+            try:
+                with c.transaction():
+                    c.place_in_cache("inner", b"eggs")
+                    raise RuntimeError()
+            except RuntimeError:
+                pass
+            c.place_in_cache("removed", b"eggs")
+            c.remove("removed")
+        c.close()
+
+        conn = sqlite3.connect(filename)
+        assert [r for r, in conn.execute("SELECT request FROM cache")] == ["outer"]
+        conn.close()
+    finally:
+        c.close()
+
+def test_sqcache_vacuum_expired(db_cache, frozen_now):
+    now = frozen_now.frozen
     db_cache.place_in_cache("spam", b"eggs")
+    frozen_now.frozen = now + datetime.timedelta(days=2)
+    db_cache.place_in_cache("spam1", b"eggs1")
+
+    assert db_cache.vacuum_expired(datetime.timedelta(days=1)) == 1
+    assert [name for name, _ in db_cache.query()] == ["spam1"]
+
+def test_sqcache_reuses_readers(db_cache, bulk_place):
+    bulk_place([("spam", b"eggs")])
+    def task():
+        for _ in range(10):
+            assert db_cache.get_from_cache("spam")[0] == b"eggs"
+    threads = [threading.Thread(target=task) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert db_cache._readers.qsize() <= 4
+
+def test_sqcache_remove_many(db_cache, bulk_place):
+    bulk_place([("spam", b"eggs"), ("spam1", b"eggs"), ("spam2", b"eggs")])
+    db_cache.place_in_cache("spam3", b"eggs")
+
+    db_cache.remove_many(["spam", "spam2", "spam3", "missing"])
+    assert [name for name, _ in db_cache.query()] == ["spam1"]
+
+def test_sqcache_multi_threading(db_cache, bulk_place):
+    bulk_place([("spam", b"eggs")])
 
     barrier = threading.Barrier(2)
     def task():
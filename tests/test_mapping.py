@@ -1,45 +1,79 @@
 import pytest
 import unittest.mock as mock
+import numpy as np
+import functools
 
 import tilemapbase.mapping as mapping
 
-def test_projection_against_pyproj():
-    import random
-
-    for _ in range(1000):
-        lon = random.random() * 360 - 180
-        lat = random.random() * 85 * 2 - 85
-
-        x, y = mapping.project(lon, lat)
-
-        xx, yy = mapping.project_3785(lon, lat)
-        assert( x == pytest.approx(xx) )
-        assert( y == pytest.approx(yy) )
-
-        xx, yy = mapping.project_3857(lon, lat)
-        assert( x == pytest.approx(xx) )
-        assert( y == pytest.approx(yy) )
-
-def test_project_and_back_to_lonlat():
-    import random
-
-    for _ in range(1000):
-        lon = random.random() * 360 - 180
-        lat = random.random() * 85 * 2 - 85
-
-        x, y = mapping.project(lon, lat)
-        lo, la = mapping.to_lonlat(x, y)
-
-        assert( lon == pytest.approx(lo) )
-        assert( lat == pytest.approx(la) )
+# Memoised versions of pure functions, for use with fixed inputs in the tests
+project = functools.lru_cache(maxsize=64)(mapping.project)
+to_3857 = functools.lru_cache(maxsize=64)(mapping._to_3857)
+
+# 1000 random (longitude, latitude) pairs, in batches so that failures are
+# localised and the cases can be split between workers.  Seeded, so every run
+# (and every xdist worker) sees the same cases.
+_rng = np.random.default_rng(0)
+SAMPLES = [(_rng.random(100) * 360 - 180, _rng.random(100) * 85 * 2 - 85)
+    for _ in range(10)]
+
+@pytest.mark.parametrize("lons,lats", SAMPLES)
+def test_projection_against_pyproj(lons, lats):
+    x, y = np.array([mapping.project(lon, lat) for lon, lat in zip(lons, lats)]).T
+
+    xx, yy = mapping.project_3785(lons, lats)
+    np.testing.assert_allclose(x, xx, rtol=1e-9)
+    np.testing.assert_allclose(y, yy, rtol=1e-9)
+
+    xx, yy = mapping.project_3857(lons, lats)
+    np.testing.assert_allclose(x, xx, rtol=1e-9)
+    np.testing.assert_allclose(y, yy, rtol=1e-9)
+
+@pytest.mark.parametrize("lons,lats", SAMPLES)
+def test_project_and_back_to_lonlat(lons, lats):
+    x, y = np.array([mapping.project(lon, lat) for lon, lat in zip(lons, lats)]).T
+    lo, la = np.array([mapping.to_lonlat(xx, yy) for xx, yy in zip(x, y)]).T
+
+    np.testing.assert_allclose(lons, lo, rtol=1e-9, atol=1e-12)
+    np.testing.assert_allclose(lats, la, rtol=1e-9, atol=1e-12)
+
+def test_3857_arrays():
+    x, y = np.array([0.1, 0.5, 0.9]), np.array([0.2, 0.5, 0.7])
+    xx, yy = mapping._to_3857(x, y)
+    for i in range(3):
+        assert (xx[i], yy[i]) == pytest.approx(to_3857(x[i], y[i]))
+    np.testing.assert_allclose(mapping._from_3857(xx, yy), [x, y])
+
+def test_3857_to_lonlat():
+    for x, y in [(0, 0), (1e6, -2e6), (-1.5e7, 1.8e7)]:
+        expected = mapping.to_lonlat(*mapping._from_3857(x, y))
+        assert mapping._3857_to_lonlat(x, y) == pytest.approx(expected)
 
 def test_project_swapped_lon_lat():
     with pytest.raises(ValueError):
         mapping.project(45, 170)
+    with pytest.raises(ValueError):
+        mapping.project_array([45, 10], [20, 170])
+
+@pytest.mark.parametrize("lons,lats", SAMPLES)
+def test_project_array(lons, lats):
+    expected = np.array([mapping.project(lon, lat) for lon, lat in zip(lons, lats)]).T
+    np.testing.assert_allclose(mapping.project_array(lons, lats), expected, rtol=1e-12)
+
+    lo, la = mapping.to_lonlat_array(*expected)
+    np.testing.assert_allclose(lons, lo, rtol=1e-9, atol=1e-12)
+    np.testing.assert_allclose(lats, la, rtol=1e-9, atol=1e-12)
 
 
 ##### Extent class
 
+def test_Extent_projects_bounds_once():
+    ex = mapping.Extent(0.2, 0.5, 0.3, 0.4)
+    ex.project = mock.Mock(side_effect=lambda x, y : (2 * x, 3 * y))
+    assert ex.xrange == pytest.approx((0.4, 1.0))
+    assert ex.yrange == pytest.approx((1.2, 0.9))
+    assert (ex.width, ex.height) == pytest.approx((0.6, 0.3))
+    assert ex.project.call_count == 2
+
 def test_Extent_construct():
     mapping.Extent(0.2, 0.5, 0.3, 0.4)
     mapping.Extent(-0.8, -0.5, 0.3, 0.4)
@@ -53,14 +87,10 @@ def test_Extent_construct():
         mapping.Extent(0.2, 0.5, 0.3, 1.1)
 
 def assert_standard_properties(ex):
-    assert ex.xmin == pytest.approx(0.2)
-    assert ex.xmax == pytest.approx(0.5)
-    assert ex.width == pytest.approx(0.3)
-    assert ex.xrange == pytest.approx((0.2, 0.5))
-    assert ex.ymin == pytest.approx(0.3)
-    assert ex.ymax == pytest.approx(0.4)
-    assert ex.height == pytest.approx(0.1)
-    assert ex.yrange == pytest.approx((0.4, 0.3))
+    actual = [ex.xmin, ex.xmax, ex.width, *ex.xrange,
+        ex.ymin, ex.ymax, ex.height, *ex.yrange]
+    expected = [0.2, 0.5, 0.3, 0.2, 0.5, 0.3, 0.4, 0.1, 0.4, 0.3]
+    np.testing.assert_allclose(actual, expected, rtol=0, atol=1e-12)
     assert str(ex) == "Extent((0.2,0.3)->(0.5,0.4) projected as normal)"
 
 def test_Extent_properties():
@@ -85,24 +115,24 @@ def test_Extent_from_centre():
     assert ex.yrange == pytest.approx((0.25, 0.15))
 
 def test_Extent_from_lonlat():
-    x, y = mapping.project(32, -10)
+    x, y = project(32, -10)
     ex = mapping.Extent.from_centre_lonlat(32, -10, xsize=0.2)
     assert ex.xrange == pytest.approx((x-0.1, x+0.1))
     assert ex.yrange == pytest.approx((y+0.1, y-0.1))
 
-    xx, yy = mapping.project(34, -12)
+    xx, yy = project(34, -12)
     ex = mapping.Extent.from_lonlat(32, 34, -12, -10)
     assert ex.xrange == pytest.approx((x, xx))
     assert ex.yrange == pytest.approx((yy, y))
 
 def test_Extent_from_3857():
-    x, y = mapping._to_3857(0.2, 0.3)
+    x, y = to_3857(0.2, 0.3)
     ex = mapping.Extent.from_centre(0.2, 0.3, xsize=0.1).to_project_3857()
     ex1 = mapping.Extent.from_centre_3857(x, y, xsize=0.1)
     assert ex1.xrange == pytest.approx(ex.xrange)
     assert ex1.yrange == pytest.approx(ex.yrange)
 
-    xx, yy = mapping._to_3857(0.25, 0.4)
+    xx, yy = to_3857(0.25, 0.4)
     ex = mapping.Extent.from_3857(x, xx, y, yy)
     ex1 = mapping.Extent(0.2, 0.25, 0.3, 0.4).to_project_3857()
     assert ex1.xrange == pytest.approx(ex.xrange)
@@ -114,8 +144,8 @@ def test_Extent_projection():
     ex2 = ex.to_project_web_mercator()
     assert_standard_properties(ex)
     assert_standard_properties(ex2)
-    x, y = mapping._to_3857(0.2, 0.3)
-    xx, yy = mapping._to_3857(0.5, 0.4)
+    x, y = to_3857(0.2, 0.3)
+    xx, yy = to_3857(0.5, 0.4)
     assert ex1.xmin == pytest.approx(x)
     assert ex1.xmax == pytest.approx(xx)
     assert ex1.width == pytest.approx(xx - x)
@@ -142,7 +172,7 @@ def test_Extent_with_centre():
     assert ex1.yrange == pytest.approx((1, 0.9))
 
 def test_Extent_with_centre_lonlat():
-    x, y = mapping.project(32, 15)
+    x, y = project(32, 15)
     ex = mapping.Extent(0.2, 0.4, 0.3, 0.5)
     ex1 = ex.with_centre_lonlat(32, 15)
     assert ex1.xrange == pytest.approx((x-.1, x+.1))
@@ -216,7 +246,7 @@ def ex():
 
 @pytest.fixture
 def tile_provider():
-    tp = mock.Mock()
+    tp = mock.Mock(spec=["get_tile", "maxzoom", "tilesize"])
     tp.maxzoom = 19
     tp.tilesize = 256
     return tp
@@ -326,6 +356,28 @@ def test_Plotter_as_one_image_2x2(ex, tile_provider, new_image):
     tile = tile_provider.get_tile.return_value
     assert image.paste.call_args_list == [ mock.call(tile,(0,0)), mock.call(tile,(256,0)) ]
 
+def test_Plotter_as_one_image_uses_get_tiles(ex, tile_provider, new_image):
+    tile_provider.get_tiles = mock.Mock(return_value=["a", "b"])
+    plot = mapping.Plotter(ex, tile_provider, width=100)
+    image = plot.as_one_image()
+
+    tile_provider.get_tiles.assert_called_once_with([(0,0,1), (1,0,1)])
+    assert tile_provider.get_tile.call_count == 0
+    assert image.paste.call_args_list == [ mock.call("a",(0,0)), mock.call("b",(256,0)) ]
+
+def test_Plotter_remembers_tiles(ex, tile_provider, new_image):
+    plot = mapping.Plotter(ex, tile_provider, width=100)
+    plot.as_one_image()
+    plot.plot(mock.Mock())
+    plot.plotlq(mock.Mock())
+    assert tile_provider.get_tile.call_args_list == [ mock.call(0,0,1), mock.call(1,0,1) ]
+
+    tile_provider.get_tile.return_value = None
+    plot = mapping.Plotter(ex, tile_provider, zoom=0)
+    plot.as_one_image()
+    plot.as_one_image()
+    assert tile_provider.get_tile.call_args_list[-2:] == [ mock.call(0,0,0) ] * 2
+
 def test_Plotter_plot_2x2(ex, tile_provider, new_image):
     plot = mapping.Plotter(ex, tile_provider, width=100)
     ax = mock.Mock()
@@ -355,12 +407,12 @@ def test_Plotter_plot_epsg(ex, tile_provider, new_image):
     assert len(imshow) == 1
     tile, extent = imshow[0]
     assert tile == image
-    x, y = mapping._to_3857(0,0)
-    xx, yy = mapping._to_3857(1,0.5)
+    x, y = to_3857(0,0)
+    xx, yy = to_3857(1,0.5)
     assert extent == pytest.approx((x,xx,yy,y))
     kwargs = ax.set.call_args_list[0][1]
-    x, y = mapping._to_3857(0.2,0.3)
-    xx, yy = mapping._to_3857(0.5,0.4)
+    x, y = to_3857(0.2,0.3)
+    xx, yy = to_3857(0.5,0.4)
     kwargs["xlim"] == pytest.approx((x,xx))
     kwargs["ylim"] == pytest.approx((yy,y))
 
@@ -388,8 +440,12 @@ def test_parse_crs():
     with pytest.raises(ValueError):
         mapping._parse_crs({"init" : "boajsg136"})
 
+    for bad in ["epsg", "epsg:", "epsg:x3857"]:
+        with pytest.raises(ValueError):
+            mapping._parse_crs({"init" : bad})
+
 def test_parse_crs_new_style():
-    crs = mock.Mock()
+    crs = mock.Mock(spec=["srs"])
     crs.srs = "EPSG:4326"
     code = mapping._parse_crs(crs)
     assert(code == 4326)
@@ -400,3 +456,72 @@ def test_parse_crs_new_style():
 
     with pytest.raises(ValueError):
         mapping._parse_crs({"bob":"fish"})
+
+def frame_of_points(crs, coords):
+    frame = mock.Mock()
+    frame.crs = crs
+    frame.geometry = []
+    for c in coords:
+        point = mock.Mock()
+        point.coords = [c]
+        frame.geometry.append(point)
+    return frame
+
+def test_points_from_frame():
+    coords = [(-1.5, 53.8), (0.1, 51.5), (2.35, 48.85)]
+    xcs, ycs = mapping.points_from_frame(frame_of_points(None, coords))
+    expected = [project(*c) for c in coords]
+    np.testing.assert_allclose(xcs, [x for x, _ in expected])
+    np.testing.assert_allclose(ycs, [y for _, y in expected])
+
+    frame = frame_of_points({"init" : "epsg:3857"}, [(1, 2, 3), (4, 5, 6)])
+    assert mapping.points_from_frame(frame) == ([1, 4], [2, 5])
+
+def test_points_from_frame_without_numpy(monkeypatch):
+    monkeypatch.setattr(mapping, "_np", None)
+    coords = [(-1.5, 53.8), (0.1, 51.5)]
+    xcs, ycs = mapping.points_from_frame(frame_of_points(None, coords))
+    assert list(zip(xcs, ycs)) == [project(*c) for c in coords]
+
+    frame = frame_of_points({"init" : "epsg:3857"}, [(1, 2, 3), (4, 5, 6)])
+    assert mapping.points_from_frame(frame) == ([1, 4], [2, 5])
+
+def test_points_from_frame_uses_shapely(monkeypatch):
+    frame = frame_of_points(None, [])
+    frame.geometry = ["p1", "p2"]
+    monkeypatch.setattr(mapping, "_get_type_id", lambda geoms : np.zeros(len(geoms)), raising=False)
+    monkeypatch.setattr(mapping, "_get_coordinates", lambda geoms : np.array([[0.1, 51.5], [2.35, 48.85]]))
+
+    xcs, ycs = mapping.points_from_frame(frame)
+    expected = [project(0.1, 51.5), project(2.35, 48.85)]
+    np.testing.assert_allclose(xcs, [x for x, _ in expected])
+    np.testing.assert_allclose(ycs, [y for _, y in expected])
+
+def test_parse_crs_to_epsg():
+    crs = mock.Mock(spec=["to_epsg"])
+    crs.to_epsg.return_value = 3857
+    assert mapping._parse_crs(crs) == 3857
+
+    crs.to_epsg.return_value = 27700
+    with pytest.raises(ValueError):
+        mapping._parse_crs(crs)
+
+    crs.to_epsg.return_value = None
+    with pytest.raises(ValueError):
+        mapping._parse_crs(crs)
+
+    crs = mock.Mock(spec=["to_epsg", "srs"])
+    crs.to_epsg.return_value = None
+    crs.srs = "epsg:3785"
+    assert mapping._parse_crs(crs) == 3857
+
+def test_parse_crs_pyproj():
+    pyproj = pytest.importorskip("pyproj")
+    crs = pyproj.CRS.from_wkt(pyproj.CRS.from_epsg(3857).to_wkt())
+    assert mapping._parse_crs(crs) == 3857
+
+    crs = pyproj.CRS("+proj=longlat +datum=WGS84")
+    assert mapping._parse_crs(crs) == 4326
+
+    with pytest.raises(ValueError):
+        mapping._parse_crs(pyproj.CRS.from_epsg(27700))
@@ -3,6 +3,7 @@ import unittest.mock as mock
 
 import tilemapbase.ordnancesurvey as ons
 import os, re
+import numpy as np
 
 def test_project():
     assert ons.project(-1.55532, 53.80474) == pytest.approx((429383.15535285, 434363.0962841))
@@ -13,6 +14,17 @@ def test_to_latlon():
     assert ons.to_lonlat(429383.15535285, 434363.0962841) == pytest.approx((-1.55532, 53.80474))
     assert ons.to_lonlat(134041.0757941, 25435.9074222) == pytest.approx((-5.71808, 50.06942))
 
+def test_project_arrays():
+    lons = np.array([-1.55532, -5.71808, -3.02516])
+    lats = np.array([53.80474, 50.06942, 58.64389])
+    x, y = ons.project(lons, lats)
+    expected = [ons.project(lon, lat) for lon, lat in zip(lons, lats)]
+    np.testing.assert_allclose(np.column_stack([x, y]), expected)
+
+    lo, la = ons.to_lonlat(x, y)
+    np.testing.assert_allclose(lo, lons)
+    np.testing.assert_allclose(la, lats)
+
 def test_to_os_national_grid():
     assert ons.to_os_national_grid(-1.55532, 53.80474) == ("SE 29383 34363",
         #pytest.approx(0.155352845), pytest.approx(0.096284069))
@@ -27,12 +39,49 @@ def test_to_os_national_grid():
     with pytest.raises(ValueError):
         print(ons.to_os_national_grid(-10, 10))
 
+def test_to_os_national_grid_many():
+    lons = [-1.55532, -5.71808, -3.02516]
+    lats = [53.80474, 50.06942, 58.64389]
+    codes, xs, ys = ons.to_os_national_grid_many(lons, lats)
+    expected = [ons.to_os_national_grid(lon, lat) for lon, lat in zip(lons, lats)]
+    assert codes == [e[0] for e in expected]
+    np.testing.assert_allclose(xs, [e[1] for e in expected])
+    np.testing.assert_allclose(ys, [e[2] for e in expected])
+
+    with pytest.raises(ValueError):
+        ons.to_os_national_grid_many([-1.55532, -10], [53.80474, 10])
+
+def test_coords_to_os_national_grid_round_trip():
+    for ref in ["SE 29383 34363", "SW 34041 25435", "ND 40594 73345", "HP 0 99999"]:
+        assert ons.coords_to_os_national_grid(*ons.os_national_grid_to_coords(ref)) == ref
+
+    # Just outside the grid, which must not wrap round to some other square
+    for x, y in [(-1000001, 100), (1500000, 100), (100, -500001), (100, 2000000)]:
+        with pytest.raises(ValueError):
+            ons.coords_to_os_national_grid(x, y)
+
 def test_os_national_grid_to_coords():
     assert ons.os_national_grid_to_coords("SE 29383 34363") == (429383, 434363)
     assert ons.os_national_grid_to_coords("SW 34041 25435") == (134041, 25435)
     assert ons.os_national_grid_to_coords("ND 40594 73345") == (340594, 973345)
     with pytest.raises(ValueError):
         assert ons.os_national_grid_to_coords("IXJ23678412 123 12")
+    assert ons.os_national_grid_to_coords("SE 0 00012") == (400000, 400012)
+    for bad in ["SE 1 2\n", "SE \u0661\u0662 3", "SE  1 2", "SE\t1 2", " SE 1 2",
+            "SE 1 2 ", "SE \t1 2", "SE -1 2", "SE +1 2", "SE 1_0 2", "se 1 2",
+            "SEX 1 2", "SE 1", "SE 1 2 3"]:
+        with pytest.raises(ValueError):
+            ons.os_national_grid_to_coords(bad)
+        with pytest.raises(ValueError):
+            ons.os_national_grid_to_coords_many(["SE 29383 34363", bad])
+
+def test_os_national_grid_to_coords_many():
+    refs = ["SE 29383 34363", "SW 34041 25435", "ND 40594 73345", "SE 1234 43231"]
+    xs, ys = ons.os_national_grid_to_coords_many(refs)
+    assert list(zip(xs, ys)) == [ons.os_national_grid_to_coords(r) for r in refs]
+
+    with pytest.raises(ValueError):
+        ons.os_national_grid_to_coords_many(["SE 29383 34363", "IX 12345 12345"])
 
 def test_init():
     ons.init(os.path.join("tests", "test_os_map_data"))
@@ -171,7 +220,12 @@ def mock_dir_entry(name):
     m.name = name
     return m
 
-def test_MasterMap_init():
+@pytest.fixture
+def empty_lookup():
+    with mock.patch("tilemapbase.ordnancesurvey._lookup", new={}):
+        yield None
+
+def test_MasterMap_init(empty_lookup):
     with mock.patch("os.path.abspath") as abspath_mock:
         abspath_mock.return_value = "spam"
         with mock.patch("os.scandir") as scandir_mock:
@@ -244,6 +298,26 @@ def test_MiniScale_cache(mini, image_mock):
     ts("SD 1 2")
     image_mock.open.assert_called_with(os.path.join("dirone", "mini_one.tif"))
 
+def test_MiniScale_caches_tiles(mini, image_mock):
+    ts = ons.MiniScale()
+    ts.filename = "mini_two.tif"
+    image = image_mock.open.return_value
+    assert ts.tile_cache_size == 0
+    ts("SE 1234 43231")
+    ts("SE 1234 43231")
+    assert image.crop.call_count == 2
+
+    ts.tile_cache_size = 2
+    assert ts.tile_cache_size == 2
+    image.crop.side_effect = lambda box : mock.Mock()
+    tile = ts("SE 1234 43231")
+    assert ts("SE 1234 43231") is tile
+    assert image.crop.call_count == 3
+    ts("SD 1 2")
+    ts("NZ 1 2")
+    assert ts("SE 1234 43231") is not tile
+    assert image.crop.call_count == 6
+
 @pytest.fixture
 def overview():
     files = {"overview" : {"mini_one.tif" : "dirone", "mini_two.tif" : "dirtwo"}}
@@ -294,6 +368,17 @@ def test_Extent_construct():
     assert ex.xrange == (340094, 341094)
     assert ex.yrange == (972345, 974345)
 
+def test_Extent_from_centres():
+    exs = ons.Extent.from_centres([1000, 2000], [0, 100], xsize=1000, aspect=[2.0, 0.5])
+    assert [ex.xrange for ex in exs] == [(500, 1500), (1500, 2500)]
+    assert [ex.yrange for ex in exs] == [(-250, 250), (-900, 1100)]
+
+    exs = ons.Extent.from_centres([1000], [0], xsize=1000, ysize=4000)
+    assert [(ex.xrange, ex.yrange) for ex in exs] == [((500, 1500), (-2000, 2000))]
+
+    with pytest.raises(ValueError):
+        ons.Extent.from_centres([1000], [0])
+
 def test_Extent_mutations():
     # 1000 x 5000
     ex = ons.Extent(1000, 2000, 4000, 9000)
@@ -346,6 +431,10 @@ def test_TileScalar(source, image_mock):
     source.return_value.convert.assert_called_with("RGB")
     source.return_value.convert.return_value.resize.assert_called_with((500, 500), image_mock.LANCZOS)
 
+    source.reset_mock()
+    assert ts("SN 1234 54321") is tile
+    assert source.call_args_list == []
+
 def test_Plotter_plotlq(source):
     ex = ons.Extent(1100, 1900, 4200, 5500)
     plotter = ons.Plotter(ex, source)
@@ -1,6 +1,6 @@
 import pytest
 import unittest.mock as mock
-import os, shutil
+import os, threading
 import PIL.Image
 import datetime
 
@@ -36,7 +36,7 @@ import collections
 Response = collections.namedtuple("Response", ["ok", "content"])
 
 @mock.patch("tilemapbase.tiles._sqcache")
-@mock.patch("requests.get")
+@mock.patch("requests.Session.get")
 def test_Tiles(get, sqcache, image):
     sqcache.get_from_cache.return_value = None
     get.return_value = Response(True, image)
@@ -50,7 +50,7 @@ def test_Tiles(get, sqcache, image):
     assert(sqcache.place_in_cache.call_args[0][0] == "TEST#10#20#5")
 
 @mock.patch("tilemapbase.tiles._sqcache")
-@mock.patch("requests.get")
+@mock.patch("requests.Session.get")
 def test_invalid_Tiles(get, sqcache):
     sqcache.get_from_cache.return_value = None
     get.return_value = Response(True, "abcdef")
@@ -62,7 +62,7 @@ def test_invalid_Tiles(get, sqcache):
     assert("Received invalid tile" in str(exc_info.value))
 
 @mock.patch("tilemapbase.tiles._sqcache")
-@mock.patch("requests.get")
+@mock.patch("requests.Session.get")
 def test_OSM(get, sqcache, image):
     sqcache.get_from_cache.return_value = None
     get.return_value = Response(True, image)
@@ -71,6 +71,50 @@ def test_OSM(get, sqcache, image):
 
     assert(get.call_args[0][0] == "http://a.tile.openstreetmap.org/20/5/10.png")
 
+@mock.patch("tilemapbase.tiles._sqcache")
+@mock.patch("requests.Session.get")
+def test_Tiles_get_tiles(get, sqcache, image):
+    sqcache.get_many.return_value = {}
+    get.return_value = Response(True, image)
+
+    t = tiles.Tiles("example{zoom}/{x}/{y}.jpg", "TEST")
+    out = t.get_tiles([(10,20,5), (11,20,5), (10,20,5)])
+
+    assert len(out) == 3
+    assert all(x.width == 256 for x in out)
+    assert out[0] is out[2]
+    assert set(c[0][0] for c in get.call_args_list) == {"example5/10/20.jpg", "example5/11/20.jpg"}
+    assert get.call_count == 2
+    assert sqcache.get_many.call_count == 1
+    assert set(sqcache.get_many.call_args[0][0]) == {"TEST#10#20#5", "TEST#11#20#5"}
+
+@mock.patch("tilemapbase.tiles._sqcache")
+@mock.patch("requests.Session.get")
+def test_Tiles_get_tiles_reuses_threads(get, sqcache, image):
+    sqcache.get_many.return_value = {}
+    threads = []
+    def fetch(*args, **kwargs):
+        threads.append(threading.current_thread())
+        return Response(True, image)
+    get.side_effect = fetch
+
+    t = tiles.Tiles("example{zoom}/{x}/{y}.jpg", "TEST")
+    t.get_tiles([(x, 1, 5) for x in range(4)], max_workers=2)
+    first = set(threads)
+    threads.clear()
+    t.get_tiles([(x, 2, 5) for x in range(4)], max_workers=2)
+
+    assert len(first) <= 2
+    assert set(threads) <= first
+    assert all(thread.is_alive() for thread in first)
+
+def test_url_builder():
+    for template in ["http://a.tile.openstreetmap.org/{zoom}/{x}/{y}.png",
+            "http://a.tile.openstreetmap.fr/hot/{zoom}/{x}/{y}.png ",
+            "example{zoom}/{x}/{y}", "{x}/{y}/{zoom}", "{zoom:02d}/{x}/{y}"]:
+        build = tiles._url_builder(template)
+        assert build(5, 12, 7) == template.format(x=5, y=12, zoom=7)
+
 def test_Cache():
     cache_mock = mock.Mock()
     tile_cache_test = tiles.Cache(cache_mock)
@@ -89,35 +133,35 @@ def test_Cache():
     cache_mock.query.assert_called_with()
     assert data == [(("SPAM", 2, 5, 32), "eggs")]
 
+    cache_mock.get_many.return_value = {"SPAM#6#3#12" : "eggs"}
+    data = tile_cache_test.get_many([("SPAM", 6, 3, 12), ("SPAM", 1, 2, 3)])
+    assert set(cache_mock.get_many.call_args[0][0]) == {"SPAM#6#3#12", "SPAM#1#2#3"}
+    assert data == {("SPAM", 6, 3, 12) : "eggs"}
+
+    cache_mock.iter_query.return_value = iter([("SPAM#2#5#32", "eggs")])
+    assert list(tile_cache_test.iter_query()) == [(("SPAM", 2, 5, 32), "eggs")]
+
     tile_cache_test.remove(("SPAM", 6, 3, 12))
     cache_mock.remove.assert_called_with("SPAM#6#3#12")
+
+    cache_mock.removal_count = 7
+    assert tile_cache_test.removal_count == 7
     
 @pytest.fixture
-def dumpdir():
-    name = "test_dump_dir"
-    try:
-        shutil.rmtree(name)
-    except:
-        pass
-    try:
-        os.mkdir(name)
-    except:
-        pass
-    yield name
-    try:
-        shutil.rmtree(name)
-    except:
-        pass
+def dumpdir(tmp_path):
+    name = tmp_path / "test_dump_dir"
+    name.mkdir()
+    return str(name)
 
 def test_Cache_dump(dumpdir):
     cache_mock = mock.Mock()
     tile_cache_test = tiles.Cache(cache_mock)
-    cache_mock.query.return_value = [
+    cache_mock.iter_query.return_value = iter([
         ("ONE#1#2#5", None),
         ("ONE#1#3#5", None),
         ("ONE#4#5#6", None),
         ("TWO#1#2#5", None)
-        ]
+        ])
     def get_data(key):
         if key == "ONE#1#2#5":
             return (b"\x89PNG", None)
@@ -160,5 +204,4 @@ def test_Cache_clean():
         ]
     tile_cache_test.clean(datetime.datetime(2017,5,4,12,30,1))
 
-    cache_mock.remove.call_args_list == [
-        mock.call("ONE#4#5#6"), mock.call("TWO#1#2#5") ]
+    cache_mock.remove_many.assert_called_once_with(["ONE#4#5#6", "TWO#1#2#5"])
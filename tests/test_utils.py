@@ -41,6 +41,34 @@ def test_Cache_evict():
     c[9] = "e"
     assert set(c.keys()) == {7,9}
 
+def test_Cache_info():
+    c = utils.Cache(2)
+    c[5] = "a"
+    assert c[5] == "a"
+    with pytest.raises(KeyError):
+        c[6]
+    assert c.get(7) is None
+    assert c.get(7, "b") == "b"
+    assert c.cache_info() == (1, 3, 2, 1)
+
+    assert c.get(5) == "a"
+    assert 6 not in c and 5 in c
+    assert c.cache_info() == (2, 3, 2, 1)
+
+def test_Cache_get_is_most_recent_use():
+    c = utils.Cache(2)
+    c[1], c[2] = "a", "b"
+    assert c.get(1) == "a"
+    c[3] = "c"
+    assert set(c) == {1, 3}
+
+def test_ImageCache_get_decompresses(random_image):
+    c = utils.ImageCache()
+    c[5] = random_image
+    assert c.get(5).tobytes() == random_image.tobytes()
+    assert c.get(6) is None
+    assert c.cache_info() == (1, 1, 32, 1)
+
 @pytest.fixture
 def random_image():
     image = PIL.Image.new("RGB", (200, 100))
@@ -81,6 +109,21 @@ def test_ImageCache(random_pal_image):
     assert image.tobytes() == random_pal_image.tobytes()
     assert image.getpalette() == random_pal_image.getpalette()
 
+def test_ImageCache_uncompressed(random_pal_image):
+    c = utils.ImageCache(compress=False)
+    c[5] = random_pal_image
+    c[7] = "spam"
+
+    assert c[7] == "spam"
+    image = c[5]
+    assert image is not random_pal_image
+    assert image.mode == random_pal_image.mode
+    assert image.tobytes() == random_pal_image.tobytes()
+    assert image.getpalette() == random_pal_image.getpalette()
+
+    image.putpixel((0, 0), 255 - image.getpixel((0, 0)))
+    assert c[5].tobytes() == random_pal_image.tobytes()
+
 def test_PerThreadProvider():
     count = 0
     def factory():
@@ -110,3 +153,18 @@ def test_PerThreadProvider():
     assert ptp.get() == 1
     assert len(ptp.active_objects()) == 1
     assert called
+
+def test_PerThreadProvider_cleans_on_join():
+    ptp = utils.PerThreadProvider(object)
+    destroyed = []
+    ptp.set_destructor(destroyed.append)
+    ours = ptp.get()
+
+    made = []
+    thread = threading.Thread(target=lambda : made.append(ptp.get()))
+    thread.start()
+    thread.join()
+
+    assert ptp.get() is ours
+    assert destroyed == made
+    assert ptp.active_objects() == [ours]
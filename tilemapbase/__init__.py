@@ -1,7 +1,7 @@
 __version__ = "0.4.7"
 
 from .tiles import init, get_cache
-from .mapping import project, to_lonlat, Extent, Plotter, extent_from_frame
+from .mapping import project, to_lonlat, project_array, to_lonlat_array, Extent, Plotter, extent_from_frame
 from .utils import start_logging
 
 from . import tiles
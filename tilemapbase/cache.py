@@ -13,8 +13,23 @@ identifier of the request.  Any object which can be converted to `bytes` by
 import datetime as _datetime
 import sqlite3 as _sqlite3
 import os as _os
+import time as _time
+import threading as _threading
+import weakref as _weakref
+import atexit as _atexit
+import hashlib as _hashlib
+import contextlib as _contextlib
+import queue as _queue
+import functools as _functools
+import zlib as _zlib
 from . import utils as _utils
 
+# Optional, for better compression of stored objects
+try:
+    import zstandard as _zstd
+except:
+    _zstd = None
+
 class Executor():
     """A base class for executing a request, if the cache does not already have
     access to the object requested.  Any class with this interface will work.
@@ -32,6 +47,11 @@ class ConcreteCache():
     """Abstract base class for a class which implements storing and retrieving
     objects.  Each object should be timestamped with its last update time.
     """
+    #: Should be increased each time objects are removed from the cache, so
+    #: that copies held elsewhere (e.g. in memory by :class:`Cache`) can be
+    #: discarded.
+    removal_count = 0
+
     def get_from_cache(self, str_request):
         """Return `None` on failure to find.
         
@@ -39,6 +59,22 @@ class ConcreteCache():
         """
         raise NotImplementedError()
 
+    def get_many(self, str_requests):
+        """Look up many objects at once.  This default implementation calls
+        :meth:`get_from_cache` for each in turn.
+
+        :param str_requests: Iterable of `str_request` objects.
+
+        :return: Dictionary from each `str_request` which was found to the pair
+          `(object, last_update_time)`.
+        """
+        out = dict()
+        for str_request in str_requests:
+            cached = self.get_from_cache(str_request)
+            if cached is not None:
+                out[str_request] = cached
+        return out
+
     def place_in_cache(self, str_request, obj_as_bytes):
         """Write the object to the cache.  Should use the current time when
         storing the "last update time"."""
@@ -51,10 +87,23 @@ class ConcreteCache():
         """
         raise NotImplementedError()
 
+    def iter_query(self):
+        """As :meth:`query`, but returns an iterator, which may read from the
+        underlying storage lazily.  Do not modify the cache while iterating.
+        This default implementation simply iterates over :meth:`query`.
+        """
+        return iter(self.query())
+
     def remove(self, str_request):
         """Remove the item from the cache."""
         raise NotImplementedError()
 
+    def remove_many(self, str_requests):
+        """Remove all the items from the cache.  This default implementation
+        calls :meth:`remove` for each in turn."""
+        for str_request in str_requests:
+            self.remove(str_request)
+
 
 class Cache(Executor):
     """A base class for a "cache".  Implements the business logic, but defers
@@ -64,12 +113,15 @@ class Cache(Executor):
       cannot satisfy the request.
     :param cache: The :class:`ConcereteCache` instance to use for storing
       objects.
+    :param memory_size: The number of recently used objects to also hold in
+      memory, in front of `cache`.
     """
-    def __init__(self, executor, cache):
+    def __init__(self, executor, cache, memory_size=256):
         self._executor = executor
         self._cache = cache
         self._expire_time = None
-        pass
+        self._memory_lock = _threading.Lock()
+        self.memory_size = memory_size
 
     def no_timeout(self):
         """Set so that no cache objects expire."""
@@ -86,31 +138,129 @@ class Cache(Executor):
     def expire_time(self, duration):
         self._expire_time = duration
 
+    @property
+    def memory_size(self):
+        """The number of recently used objects held in memory, so that repeated
+        requests do not need to go to the underlying cache.  All of them are
+        forgotten whenever objects are removed from the underlying cache (as
+        told by its :attr:`ConcreteCache.removal_count`).  Set to 0 to
+        disable.
+        """
+        return self._memory_size
+
+    @memory_size.setter
+    def memory_size(self, size):
+        with self._memory_lock:
+            self._memory_size = size
+            self._memory = _utils.Cache(size) if size > 0 else None
+            self._memory_removals = self._cache.removal_count
+
+    def _check_removals(self):
+        """Forget everything held in memory if objects have since been removed
+        from the underlying cache.  Only use with `self._memory_lock` held."""
+        removals = self._cache.removal_count
+        if removals != self._memory_removals:
+            self._memory = _utils.Cache(self._memory_size)
+            self._memory_removals = removals
+
+    def _recall(self, str_request):
+        with self._memory_lock:
+            if self._memory is None:
+                return None
+            self._check_removals()
+            return self._memory.get(str_request)
+
+    def _remember(self, str_request, cache):
+        with self._memory_lock:
+            if self._memory is not None:
+                self._check_removals()
+                self._memory[str_request] = cache
+
+    def _is_current(self, cache):
+        if cache is None:
+            return False
+        if self.expire_time is None:
+            return True
+        since_refresh = _datetime.datetime.now() - cache[1]
+        return since_refresh <= self.expire_time
+
+    def _fetch_and_place(self, request, str_request):
+        obj = self._executor.fetch(request)
+        if obj is not None:
+            obj_as_bytes = bytes(obj)
+            self._cache.place_in_cache(str_request, obj_as_bytes)
+            self._remember(str_request, (obj_as_bytes, _datetime.datetime.now()))
+        return obj
+
     def fetch(self, request):
         str_request = str(request)
 
-        cache = self._cache.get_from_cache(str_request)
-        if self.expire_time is not None and cache is not None:
-            since_refresh = _datetime.datetime.now() - cache[1]
-            if since_refresh > self.expire_time:
-                cache = None
+        cache = self._recall(str_request)
+        if self._is_current(cache):
+            return cache[0]
 
-        if cache is None:
-            obj = self._executor.fetch(request)
-            if obj is not None:
-                self._cache.place_in_cache(str_request, bytes(obj))
-        else:
-            obj = cache[0]
-        return obj
+        cache = self._cache.get_from_cache(str_request)
+        if not self._is_current(cache):
+            return self._fetch_and_place(request, str_request)
+        self._remember(str_request, cache)
+        return cache[0]
+
+    def fetch_many(self, requests, mapper=map):
+        """Fetch many requests.  The cache is searched for all of them at once,
+        and each distinct request which is missing (or has expired) is passed
+        to the executor once.
+
+        :param requests: Iterable of request objects.
+        :param mapper: Callable with the same interface as the builtin `map`,
+          used to make the calls to the executor.  For example, pass the `map`
+          method of a :class:`concurrent.futures.ThreadPoolExecutor` to fetch
+          in parallel.
+
+        :return: List of objects, in the same order as `requests`.
+        """
+        requests = list(requests)
+        str_requests = [str(request) for request in requests]
+
+        found, wanted = dict(), dict()
+        for request, str_request in zip(requests, str_requests):
+            cache = self._recall(str_request)
+            if self._is_current(cache):
+                found[str_request] = cache[0]
+            else:
+                wanted[str_request] = request
+        cached = self._cache.get_many(wanted) if wanted else dict()
+
+        missing = dict()
+        for str_request, request in wanted.items():
+            cache = cached.get(str_request)
+            if self._is_current(cache):
+                found[str_request] = cache[0]
+                self._remember(str_request, cache)
+            else:
+                missing[str_request] = request
+
+        objs = mapper(self._fetch_and_place, missing.values(), missing.keys())
+        found.update(zip(missing.keys(), objs))
+        return [found[str_request] for str_request in str_requests]
 
 
 def database_exists(db_filename):
     """Attempt to open the file as a SQLite database and see if there is a
     table "cache".  Returns `True` if there is (with any schema) and `False`
     for any error.
+
+    The answer is remembered until the file's size or modification time
+    changes.
     """
     try:
-        _os.stat(db_filename)
+        stat = _os.stat(db_filename)
+    except Exception:
+        return False
+    return _database_exists(_os.path.abspath(db_filename), stat.st_mtime_ns, stat.st_size)
+
+@_functools.lru_cache(maxsize=64)
+def _database_exists(db_filename, mtime_ns, size):
+    try:
         conn = _sqlite3.connect(db_filename)
         try:
             tables = conn.execute("SELECT name FROM sqlite_master WHERE type='table'").fetchall()
@@ -124,59 +274,429 @@ def database_exists(db_filename):
         return False
 
 
+def _request_hash(str_request):
+    """A 64-bit signed integer hash of the string, stable between runs, for use
+    as the primary key of the "cache" table."""
+    digest = _hashlib.blake2b(str_request.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "little", signed=True)
+
+
+# Values of the "codec" column
+_CODEC_RAW, _CODEC_ZLIB, _CODEC_ZSTD = 0, 1, 2
+
+# `zstandard` (de)compressors are not thread-safe, so keep one per thread
+_zstd_local = _threading.local()
+
+def _encode(data, compress):
+    """Compress the bytes, if that makes them smaller.
+
+    :return: Pair `(data, codec)`
+    """
+    if not compress:
+        return data, _CODEC_RAW
+    if _zstd is not None:
+        if not hasattr(_zstd_local, "compressor"):
+            _zstd_local.compressor = _zstd.ZstdCompressor(level=3)
+        encoded, codec = _zstd_local.compressor.compress(data), _CODEC_ZSTD
+    else:
+        encoded, codec = _zlib.compress(data), _CODEC_ZLIB
+    if len(encoded) >= len(data):
+        return data, _CODEC_RAW
+    return encoded, codec
+
+def _decode(data, codec):
+    """Reverse :func:`_encode`.  Raises `ValueError` if the codec is not
+    available."""
+    if codec == _CODEC_RAW:
+        return data
+    if codec == _CODEC_ZLIB:
+        return _zlib.decompress(data)
+    if codec == _CODEC_ZSTD and _zstd is not None:
+        if not hasattr(_zstd_local, "decompressor"):
+            _zstd_local.decompressor = _zstd.ZstdDecompressor()
+        return _zstd_local.decompressor.decompress(data)
+    raise ValueError("Cannot decode data stored with codec {}".format(codec))
+
+
+_open_caches = _weakref.WeakSet()
+
+@_atexit.register
+def _flush_open_caches():
+    for sqcache in list(_open_caches):
+        try:
+            sqcache.flush()
+        except Exception:
+            pass
+
+def _flush_later(ref):
+    # Holds only a weak reference, so a pending timer does not keep the cache
+    # alive; if it has been collected, `__del__` has already flushed.
+    sqcache = ref()
+    if sqcache is not None:
+        try:
+            sqcache.flush()
+        except Exception:
+            # Left pending, for the next write or `close` to retry
+            pass
+
+
 class SQLiteCache(ConcreteCache):
     """Uses a SQLite database to implement a cache.  There is one table,
-    "cache", and objects are stored by the string of their "request".
+    "cache", and objects are stored by the string of their "request", keyed
+    by a 64-bit hash of that string.
+
+    All writes go through a single connection.  Reads borrow one of a pool of
+    read-only connections, so there are only ever as many as the number of
+    threads reading at the same time.
+
+    Writes are buffered, and committed to the database in a single transaction
+    once `batch_size` are pending, or at the latest `flush_interval` seconds
+    after the oldest pending write was made.  Reads see pending writes, but
+    other connections to the database (for example, in another process) do
+    not until they are committed.  Call :meth:`flush` to force pending writes
+    to disk; this is done automatically by :meth:`close`, when the cache is
+    garbage collected, and at interpreter exit.  To group many writes into
+    one commit, use :meth:`transaction`.
 
     :param db_filename: The filename of the database.  If the database exists,
       we check for the existance of a table "cache", and create it if it
       doesn't exist.
+    :param batch_size: The number of writes to buffer before committing.
+    :param flush_interval: The maximum time, in seconds, a write is buffered
+      before being committed.
+    :param compress: If `True`, store objects compressed (with `zstandard` if
+      it is installed, otherwise with `zlib`) when that makes them smaller.
+      Only worth it for data which is not already compressed: PNG and JPEG
+      map tiles barely shrink, and compressing costs time on every write, so
+      this defaults to `False`.  Objects stored with a compressor which is not
+      now available are treated as not being in the cache.  Objects stored
+      compressed are always read back correctly, whatever this setting.
     """
-    def __init__(self, db_filename):
+    def __init__(self, db_filename, batch_size=64, flush_interval=0.25, compress=False):
         if not database_exists(db_filename):
             self._make_database(db_filename)
+        else:
+            self._migrate_database(db_filename)
         self._filename = db_filename
-        self._connection_provider = _utils.PerThreadProvider(self._new)
+        self._writer = None
+        self._readers = _queue.LifoQueue()
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+        self._compress = compress
+        self._pending = dict()
+        self._pending_since = None
+        self._timer = None
+        self.removal_count = 0
+        self._lock = _threading.RLock()
+        self._local = _threading.local()
+        _open_caches.add(self)
+
+    # The `sqlite3` module keeps a per-connection cache of compiled statements,
+    # keyed by SQL text; so always use exactly these strings.
+    _SELECT = "SELECT data, create_time, codec FROM cache WHERE id=? AND request=?"
+    _INSERT = "INSERT OR REPLACE INTO cache(id, request, data, create_time, codec) VALUES (?,?,?,?,?)"
+    _QUERY = "SELECT request, create_time FROM cache"
+    _SELECT_MANY = "SELECT request, data, create_time, codec FROM cache WHERE id IN ({})"
+    # Older SQLite builds allow at most 999 parameters in one statement
+    _MAX_PARAMETERS = 500
+    _DELETE = "DELETE FROM cache WHERE id=? AND request=?"
 
     def _new(self):
-        return _sqlite3.connect(self._filename)
+        # Each connection is only ever used by one thread at a time, but not
+        # always the same thread.  Transactions are managed explicitly, so
+        # run in autocommit mode.
+        conn = _sqlite3.connect(self._filename, cached_statements=256,
+            check_same_thread=False, isolation_level=None)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+        except _sqlite3.OperationalError:
+            # E.g. a read-only filesystem, where the WAL files cannot be made
+            pass
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA mmap_size=268435456")
+        conn.execute("PRAGMA cache_size=-20000")
+        return conn
+
+    def _writer_connection(self):
+        """The connection used for writing.  Only use with `self._lock` held."""
+        if self._writer is None:
+            self._writer = self._new()
+        return self._writer
+
+    @_contextlib.contextmanager
+    def _reader(self):
+        """Context manager which borrows a read-only connection from the pool.
+        """
+        try:
+            conn = self._readers.get_nowait()
+        except _queue.Empty:
+            conn = self._new()
+            conn.execute("PRAGMA query_only=ON")
+        try:
+            yield conn
+        finally:
+            self._readers.put(conn)
+
+    # Version 1: `create_time` is an INTEGER unix timestamp, not an ISO string
+    # Version 2: Keyed by `id INTEGER PRIMARY KEY`, a hash of `request`
+    # Version 3: `codec` column saying how `data` is compressed
+    _SCHEMA_VERSION = 3
+    _CREATE = ("CREATE table {} (id INTEGER PRIMARY KEY, request TEXT, data BLOB, "
+        "create_time INTEGER, codec INTEGER NOT NULL DEFAULT 0)")
 
     def _make_database(self, db_filename):
         conn = _sqlite3.connect(db_filename)
         try:
-            conn.execute("CREATE table cache (request STRING UNIQUE, data BLOB, create_time STRING)")
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            conn.execute(self._CREATE.format("cache"))
+            conn.execute("PRAGMA user_version={}".format(self._SCHEMA_VERSION))
+        finally:
+            conn.close()
+
+    def _migrate_database(self, db_filename):
+        # All in one explicit transaction, including `user_version`, so an
+        # interrupted migration leaves the database as it was.  (The legacy
+        # transaction handling of `sqlite3` would run the DDL in autocommit.)
+        conn = _sqlite3.connect(db_filename, isolation_level=None)
+        try:
+            if conn.execute("PRAGMA user_version").fetchone()[0] >= self._SCHEMA_VERSION:
+                return
+            # No `deterministic=True`, which needs Python 3.8+
+            conn.create_function("request_hash", 1, _request_hash)
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Read again, in case another process migrated in the meantime
+                version = conn.execute("PRAGMA user_version").fetchone()[0]
+                if version < 1:
+                    # Old times were written as local time; the "utc" modifier
+                    # interprets them as such.
+                    conn.execute("UPDATE cache SET create_time = "
+                        "CAST(strftime('%s', create_time, 'utc') AS INTEGER) "
+                        "WHERE typeof(create_time)='text'")
+                if version < 2:
+                    # Left behind by an interrupted migration of an older version
+                    conn.execute("DROP TABLE IF EXISTS cache_new")
+                    conn.execute(self._CREATE.format("cache_new"))
+                    conn.execute("INSERT OR REPLACE INTO cache_new(id, request, data, create_time) "
+                        "SELECT request_hash(request), request, data, create_time FROM cache")
+                    conn.execute("DROP TABLE cache")
+                    conn.execute("ALTER TABLE cache_new RENAME TO cache")
+                elif version < 3:
+                    conn.execute("ALTER TABLE cache ADD COLUMN codec INTEGER NOT NULL DEFAULT 0")
+                conn.execute("PRAGMA user_version={}".format(self._SCHEMA_VERSION))
+                conn.execute("COMMIT")
+            except:
+                conn.execute("ROLLBACK")
+                raise
         finally:
             conn.close()
 
-    _ISO_FORMAT = "%Y-%m-%dT%H:%M:%S"
+    def _own_writes(self):
+        """This thread's uncommitted writes, one dict per open
+        :meth:`transaction` block, innermost last."""
+        try:
+            return self._local.transactions
+        except AttributeError:
+            self._local.transactions = []
+            return self._local.transactions
 
     def get_from_cache(self, str_request):
-        conn = self._connection_provider.get()
-        row = conn.execute("SELECT data, create_time FROM cache WHERE request=?", (str_request,)).fetchone()
+        row = None
+        for rows in reversed(self._own_writes()):
+            row = rows.get(str_request)
+            if row is not None:
+                break
         if row is None:
+            with self._lock:
+                row = self._pending.get(str_request)
+        if row is not None:
+            return row[0], _datetime.datetime.fromtimestamp(row[1])
+        with self._reader() as conn:
+            row = conn.execute(self._SELECT, (_request_hash(str_request), str_request)).fetchone()
+        if row is None:
+            return None
+        try:
+            data = _decode(row[0], row[2])
+        except ValueError:
             return None
-        update_time = _datetime.datetime.strptime(row[1], self._ISO_FORMAT)
-        return row[0], update_time
+        return data, _datetime.datetime.fromtimestamp(row[1])
+
+    def get_many(self, str_requests):
+        str_requests = list(str_requests)
+        with self._lock:
+            pending = {str_request : self._pending[str_request]
+                for str_request in str_requests if str_request in self._pending}
+        for rows in self._own_writes():
+            pending.update((str_request, rows[str_request])
+                for str_request in str_requests if str_request in rows)
+
+        fromtimestamp = _datetime.datetime.fromtimestamp
+        wanted = set(str_requests)
+        out = dict()
+        with self._reader() as conn:
+            for start in range(0, len(str_requests), self._MAX_PARAMETERS):
+                chunk = [_request_hash(str_request) for str_request
+                    in str_requests[start : start + self._MAX_PARAMETERS]]
+                sql = self._SELECT_MANY.format(",".join("?" * len(chunk)))
+                for str_request, data, create_time, codec in conn.execute(sql, chunk):
+                    # Guard against a hash collision
+                    if str_request not in wanted:
+                        continue
+                    try:
+                        out[str_request] = (_decode(data, codec), fromtimestamp(create_time))
+                    except ValueError:
+                        pass
+        for str_request, row in pending.items():
+            out[str_request] = (row[0], fromtimestamp(row[1]))
+        return out
 
     def place_in_cache(self, str_request, obj_as_bytes):
-        update_time = _datetime.datetime.strftime(_datetime.datetime.now(), self._ISO_FORMAT)
-        data = (str_request, obj_as_bytes, update_time)
-        with self._connection_provider.get() as conn:
-            conn.execute("INSERT OR REPLACE INTO cache(request, data, create_time) VALUES (?,?,?)", data)
+        update_time = int(_datetime.datetime.now().timestamp())
+        encoded, codec = _encode(obj_as_bytes, self._compress)
+        row = (obj_as_bytes, update_time, encoded, codec)
+        transactions = self._own_writes()
+        if transactions:
+            transactions[-1][str_request] = row
+            return
+        with self._lock:
+            self._pending[str_request] = row
+            if self._pending_since is None:
+                self._pending_since = _time.monotonic()
+            if self._timer is None:
+                self._timer = _threading.Timer(self._flush_interval,
+                    _flush_later, (_weakref.ref(self),))
+                self._timer.daemon = True
+                self._timer.start()
+            if (len(self._pending) >= self._batch_size or
+                    _time.monotonic() - self._pending_since >= self._flush_interval):
+                self.flush()
+
+    def flush(self):
+        """Commit all buffered writes to the database, in one transaction."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self._pending:
+                return
+            rows = [(_request_hash(str_request), str_request, encoded, update_time, codec)
+                for str_request, (_, update_time, encoded, codec) in self._pending.items()]
+            conn = self._writer_connection()
+            # Take the write lock now, rather than on the first insert
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.executemany(self._INSERT, rows)
+                conn.execute("COMMIT")
+            except:
+                conn.execute("ROLLBACK")
+                raise
+            self._pending.clear()
+            self._pending_since = None
+
+    @_contextlib.contextmanager
+    def transaction(self):
+        """Context manager.  Writes made in this thread, inside the block, are
+        held back (visible only to this thread) until the block exits, and
+        then committed together in one transaction.  If the block raises, its
+        writes are discarded instead.  May be nested: an inner block's writes
+        join the enclosing block's when it exits normally.
+        """
+        transactions = self._own_writes()
+        transactions.append(dict())
+        try:
+            yield self
+        except BaseException:
+            transactions.pop()
+            raise
+        rows = transactions.pop()
+        if transactions:
+            transactions[-1].update(rows)
+        elif rows:
+            with self._lock:
+                self._pending.update(rows)
+                self.flush()
 
     def query(self):
-        conn = self._connection_provider.get()
-        cursor = conn.execute("SELECT request, create_time FROM cache")
-        out = []
-        for row in cursor:
-            update_time = _datetime.datetime.strptime(row[1], self._ISO_FORMAT)
-            out.append((row[0], update_time))
-        return out
+        return list(self.iter_query())
+
+    def iter_query(self):
+        self.flush()
+        return self._iter_query()
+
+    def _iter_query(self):
+        fromtimestamp = _datetime.datetime.fromtimestamp
+        with self._reader() as conn:
+            for request, create_time in conn.execute(self._QUERY):
+                yield request, fromtimestamp(create_time)
 
     def remove(self, str_request):
-        with self._connection_provider.get() as conn:
-            conn.execute("DELETE FROM cache WHERE request=?", (str_request,))
+        for rows in self._own_writes():
+            rows.pop(str_request, None)
+        with self._lock:
+            self._pending.pop(str_request, None)
+            self._writer_connection().execute(self._DELETE,
+                (_request_hash(str_request), str_request))
+            self.removal_count += 1
+
+    def remove_many(self, str_requests):
+        rows = [(_request_hash(str_request), str_request) for str_request in str_requests]
+        for own in self._own_writes():
+            for _, str_request in rows:
+                own.pop(str_request, None)
+        with self._lock:
+            for _, str_request in rows:
+                self._pending.pop(str_request, None)
+            conn = self._writer_connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.executemany(self._DELETE, rows)
+                conn.execute("COMMIT")
+            except:
+                conn.execute("ROLLBACK")
+                raise
+            self.removal_count += 1
+
+    def vacuum_expired(self, duration):
+        """Delete, from the database, every object which was last updated more
+        than `duration` ago.  If the database was created with incremental
+        auto-vacuum, the freed pages are then returned to the filesystem.
+
+        :param duration: A :class:`datetime.timedelta` instance.
+
+        :return: The number of objects deleted.
+        """
+        cutoff = int((_datetime.datetime.now() - duration).timestamp())
+        with self._lock:
+            self.flush()
+            conn = self._writer_connection()
+            count = conn.execute("DELETE FROM cache WHERE create_time < ?", (cutoff,)).rowcount
+            if count > 0:
+                self.removal_count += 1
+            if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+                # `execute` would only step once, freeing a single page
+                conn.executescript("PRAGMA incremental_vacuum")
+        return count
+
+    def __del__(self):
+        try:
+            self.flush()
+        except Exception:
+            pass
 
     def close(self):
-        """Close the underlying database connection (for this thread)."""
-        self._connection_provider.get().close()
+        """Commit any buffered writes, and close the underlying database
+        connections.  Connections will be reopened if the cache is used
+        again."""
+        with self._lock:
+            try:
+                self.flush()
+            finally:
+                if self._writer is not None:
+                    self._writer.close()
+                    self._writer = None
+                while True:
+                    try:
+                        self._readers.get_nowait().close()
+                    except _queue.Empty:
+                        break
@@ -31,18 +31,49 @@ This object can then be used to plot the basemap to a `matplotlib` axes object.
 """
 
 import math as _math
+import functools as _functools
+import collections.abc as _collections_abc
 import PIL.Image as _Image
 
+# Optional, for vectorised methods
+try:
+    import numpy as _np
+except:
+    _np = None
+
+# Optional, shapely 2.x, for reading point coordinates in bulk
+try:
+    from shapely import get_coordinates as _get_coordinates
+    from shapely import get_type_id as _get_type_id
+except:
+    _get_coordinates = None
+
 _EPSG_RESCALE = 20037508.342789244
+_TWO_EPSG = 2 * _EPSG_RESCALE
+_INV_EPSG = 0.5 / _EPSG_RESCALE
+_INV_TWOPI = 0.5 / _math.pi
+_RAD2DEG = 180.0 / _math.pi
+_3857_TO_LON = 180.0 / _EPSG_RESCALE
+_3857_TO_ANGLE = _math.pi / _EPSG_RESCALE
+
+# Bound once, to save an attribute lookup in the per-point functions below
+_PI = _math.pi
+_asinh, _atan = _math.asinh, _math.atan
+_sinh, _tan, _radians = _math.sinh, _math.tan, _math.radians
+
+# Both of these also work elementwise on `numpy` arrays
 
 def _to_3857(x, y):
-    return ((x - 0.5) * 2 * _EPSG_RESCALE,
-        (0.5 - y) * 2 * _EPSG_RESCALE)
+    return ((x - 0.5) * _TWO_EPSG, (0.5 - y) * _TWO_EPSG)
 
 def _from_3857(x, y):
-    xx = 0.5 + (x / _EPSG_RESCALE) * 0.5
-    yy = 0.5 - (y / _EPSG_RESCALE) * 0.5
-    return xx, yy
+    return (0.5 + x * _INV_EPSG, 0.5 - y * _INV_EPSG)
+
+def _3857_to_lonlat(x, y):
+    # Same as `to_lonlat(*_from_3857(x, y))` with the algebra simplified out
+    longitude = x * _3857_TO_LON
+    latitude = _atan(_sinh(y * _3857_TO_ANGLE)) * _RAD2DEG
+    return (longitude, latitude)
 
 def project(longitude, latitude):
     """Project the longitude / latitude coords to the unit square.
@@ -56,8 +87,8 @@ def project(longitude, latitude):
     if longitude < -180 or longitude > 180 or latitude <= -90 or latitude >= 90:
         raise ValueError(f"Longitude/Latitude ({longitude}/{latitude}) is out of valid range [-180,180] / [-90,90].  Did you swap them around?")
     xtile = (longitude + 180.0) / 360.0
-    lat_rad = _math.radians(latitude)
-    ytile = (1.0 - _math.log(_math.tan(lat_rad) + (1 / _math.cos(lat_rad))) / _math.pi) / 2.0
+    # asinh(tan(lat)) == log(tan(lat) + sec(lat)), with fewer operations
+    ytile = 0.5 - _asinh(_tan(_radians(latitude))) * _INV_TWOPI
     return (xtile, ytile)
 
 def to_lonlat(x, y):
@@ -69,29 +100,69 @@ def to_lonlat(x, y):
     :return: A pair `(longitude, latitude)` in degrees.
     """
     longitude = x * 360 - 180
-    latitude = _math.atan(_math.sinh(_math.pi * (1 - y * 2))) * 180 / _math.pi
+    latitude = _atan(_sinh(_PI * (1 - y * 2))) * _RAD2DEG
+    return (longitude, latitude)
+
+def project_array(longitude, latitude):
+    """Vectorised version of :func:`project`, which requires :mod:`numpy`.
+
+    :param longitude: Array of longitudes, in degrees, between -180 and 180
+    :param latitude: Array of latitudes, in degrees, between -85 and 85
+
+    :return: Pair `(x,y)` of arrays.
+    """
+    longitude = _np.asarray(longitude, dtype=float)
+    latitude = _np.asarray(latitude, dtype=float)
+    if _np.any((longitude < -180) | (longitude > 180) | (latitude <= -90) | (latitude >= 90)):
+        raise ValueError("Longitude/Latitude is out of valid range [-180,180] / [-90,90].  Did you swap them around?")
+    xtile = (longitude + 180.0) / 360.0
+    ytile = 0.5 - _np.arcsinh(_np.tan(_np.radians(latitude))) * _INV_TWOPI
+    return (xtile, ytile)
+
+def to_lonlat_array(x, y):
+    """Vectorised version of :func:`to_lonlat`, which requires :mod:`numpy`.
+
+    :param x: Array of x coordinates, between 0 and 1.
+    :param y: Array of y coordinates, between 0 and 1.
+
+    :return: Pair `(longitude, latitude)` of arrays, in degrees.
+    """
+    x = _np.asarray(x, dtype=float)
+    y = _np.asarray(y, dtype=float)
+    longitude = x * 360 - 180
+    latitude = _np.degrees(_np.arctan(_np.sinh(_np.pi * (1 - y * 2))))
     return (longitude, latitude)
 
 
 class _BaseExtent():
     """A simple "rectangular region" class."""
+    __slots__ = ("_xmin", "_xmax", "_ymin", "_ymax", "_bounds")
+
     def __init__(self, xmin, xmax, ymin, ymax):
         self._xmin, self._xmax = xmin, xmax
         self._ymin, self._ymax = ymin, ymax
+        self._bounds = None
         if not (xmin < xmax):
             raise ValueError("xmin < xmax.")
         if not (ymin < ymax):
             raise ValueError("ymin < ymax.")
 
+    def _project_bounds(self):
+        """Projected `(xmin, ymin, xmax, ymax)`.  Instances are immutable, so
+        this is computed on first use and then remembered."""
+        self._bounds = (tuple(self.project(self._xmin, self._ymin))
+            + tuple(self.project(self._xmax, self._ymax)))
+        return self._bounds
+
     @property
     def xmin(self):
         """Minimum x value of the region."""
-        return self.project(self._xmin, self._ymin)[0]
+        return (self._bounds or self._project_bounds())[0]
 
     @property
     def xmax(self):
         """Maximum x value of the region."""
-        return self.project(self._xmax, self._ymax)[0]
+        return (self._bounds or self._project_bounds())[2]
 
     @property
     def width(self):
@@ -106,12 +177,12 @@ class _BaseExtent():
     @property
     def ymin(self):
         """Minimum y value of the region."""
-        return self.project(self._xmin, self._ymin)[1]
+        return (self._bounds or self._project_bounds())[1]
 
     @property
     def ymax(self):
         """Maximum y value of the region."""
-        return self.project(self._xmax, self._ymax)[1]
+        return (self._bounds or self._project_bounds())[3]
 
     @property
     def height(self):
@@ -148,6 +219,28 @@ class _BaseExtent():
         ymin, ymax = y - ysize / 2, y + ysize / 2
         return (xmin, xmax, ymin, ymax)
 
+    @staticmethod
+    def from_centres(x, y, xsize=None, ysize=None, aspect=1.0):
+        """Vectorised version of :meth:`from_centre`, which requires
+        :mod:`numpy`.  Each argument may be an array, or a scalar which is
+        broadcast against the other arguments.
+
+        :return: `(xmin, xmax, ymin, ymax)` as arrays.
+        """
+        if xsize is None and ysize is None:
+            raise ValueError("Must specify at least one of width and height")
+        x, y, aspect = [_np.asarray(v, dtype=float) for v in (x, y, aspect)]
+        if xsize is not None:
+            xsize = _np.asarray(xsize, dtype=float)
+        if ysize is not None:
+            ysize = _np.asarray(ysize, dtype=float)
+        if xsize is None:
+            xsize = ysize * aspect
+        if ysize is None:
+            ysize = xsize / aspect
+        x, y, xsize, ysize = _np.broadcast_arrays(x, y, xsize, ysize)
+        return (x - xsize / 2, x + xsize / 2, y - ysize / 2, y + ysize / 2)
+
     def _to_aspect(self, aspect, shrink=True):
         """Internal helper method.  Return a new bounding box.
         Shrinks / enlarges the rectangle as necessary."""
@@ -195,6 +288,8 @@ class Extent(_BaseExtent):
     :param projection_type: Internal use only, see :meth:`to_project_3857`
       and :meth:`to_project_web_mercator` instead.
     """
+    __slots__ = ("project", "_project_str")
+
     def __init__(self, xmin, xmax, ymin, ymax, projection_type="normal"):
         super().__init__(xmin, xmax, ymin, ymax)
         if ymin < 0 or ymax > 1:
@@ -360,19 +455,26 @@ class Plotter():
     
     :param extent: The base :class:`Extent` instance.
     :param tile_provider: The :class:`tiles.Tiles` object which provides
-      tiles.
+      tiles.  If it has a `get_tiles` method, as :class:`tiles.Tiles` does, then
+      this is used to fetch all the needed tiles at once, in parallel.
     :param zoom: If not `None`, then use this zoom level (will be clipped to
       the best zoom which the tile provider can give).
     :param width: Optional target width in pixels.
     :param height: Optional target height in pixels.
     """
+    __slots__ = ("_extent", "_original_extent", "_tile_provider", "_zoom",
+        "_scale", "_inv_scale", "_tiles", "_tile_bounds")
+
     def __init__(self, extent, tile_provider, zoom=None, width=None, height=None):
         if zoom is None and width is None and height is None:
             raise ValueError("Need to specify one of zoom, width or height")
         if zoom is not None and (width is not None or height is not None):
             raise ValueError("Cannot specify both a zoom and a width or height")
         
-        self._extent = extent.to_project_web_mercator()
+        if extent._project_str == "normal":
+            self._extent = extent
+        else:
+            self._extent = extent.to_project_web_mercator()
         self._original_extent = extent
         self._tile_provider = tile_provider
         if zoom is not None:
@@ -385,6 +487,19 @@ class Plotter():
                 options.append(self._needed_zoom(self._extent.ymax - self._extent.ymin, height))
             self._zoom = max(options)
         self._zoom = min(self._zoom, self._tile_provider.maxzoom)
+        if isinstance(self._zoom, int):
+            self._scale = 1 << self._zoom
+        else:
+            self._scale = 2 ** self._zoom
+        # Exact, as `_scale` is a power of two
+        self._inv_scale = 1.0 / self._scale
+        # Map from `(x, y)` to tile image, see `_get_tiles`
+        self._tiles = dict()
+        # The extent and zoom are fixed, so so is the range of tiles:
+        # `(xtilemin, xtilemax, ytilemin, ytilemax)`
+        scale, ex = self._scale, self._extent
+        self._tile_bounds = (int(scale * ex.xmin), int(scale * ex.xmax),
+            int(scale * ex.ymin), int(scale * ex.ymax))
 
     def _needed_zoom(self, web_mercator_range, pixel_range):
         zoom = _math.log2(pixel_range / (self._tile_provider.tilesize * web_mercator_range))
@@ -406,28 +521,47 @@ class Plotter():
     @property
     def xtilemin(self):
         """The least x coordinate in tile space we need to cover the region."""
-        return int(2 ** self._zoom * self._extent.xmin)
+        return self._tile_bounds[0]
 
     @property
     def xtilemax(self):
         """The greatest x coordinate in tile space we need to cover the region.
         """
-        return int(2 ** self._zoom * self._extent._xmax)
+        return self._tile_bounds[1]
 
     @property
     def ytilemin(self):
         """The least y coordinate in tile space we need to cover the region."""
-        return int(2 ** self._zoom * self._extent._ymin)
+        return self._tile_bounds[2]
 
     @property
     def ytilemax(self):
         """The greatest y coordinate in tile space we need to cover the region.
         """
-        return int(2 ** self._zoom * self._extent._ymax)
+        return self._tile_bounds[3]
+
+    def _get_tiles(self, coords):
+        """Fetch the tiles at each `(x, y)` in the list, at our zoom level.
+        Tiles are remembered, so that drawing again with this instance does
+        not need to fetch, or decode, them a second time."""
+        missing = [c for c in dict.fromkeys(coords) if c not in self._tiles]
+        if len(missing) > 0:
+            zoom = self.zoom
+            get_tiles = getattr(self._tile_provider, "get_tiles", None)
+            if get_tiles is None or len(missing) < 2:
+                get_tile = self._tile_provider.get_tile
+                tiles = [get_tile(x, y, zoom) for x, y in missing]
+            else:
+                tiles = get_tiles([(x, y, zoom) for x, y in missing])
+            for c, tile in zip(missing, tiles):
+                # Failures are not remembered, and so are retried next time
+                if tile is not None:
+                    self._tiles[c] = tile
+        return [self._tiles.get(c) for c in coords]
 
     def _check_download_size(self):
-        num_tiles = ( (self.xtilemax + 1 - self.xtilemin) *
-            (self.ytilemax + 1 - self.ytilemin) )
+        xtilemin, xtilemax, ytilemin, ytilemax = self._tile_bounds
+        num_tiles = (xtilemax + 1 - xtilemin) * (ytilemax + 1 - ytilemin)
         if num_tiles > 128:
             raise ValueError("Would use {} tiles, which is excessive.  Pass `allow_large = True` to force usage.".format(num_tiles))
 
@@ -444,13 +578,18 @@ class Plotter():
         """
         if not allow_large:
             self._check_download_size()
-        scale = 2 ** self.zoom
-        for x in range(self.xtilemin, self.xtilemax + 1):
-            for y in range(self.ytilemin, self.ytilemax + 1):
-                tile = self._tile_provider.get_tile(x, y, self.zoom)
-                x0, y0 = self.extent.project(x / scale, y / scale)
-                x1, y1 = self.extent.project((x + 1) / scale, (y + 1) / scale)
-                ax.imshow(tile, interpolation="lanczos", extent=(x0,x1,y1,y0), **kwargs)
+        xtilemin, xtilemax, ytilemin, ytilemax = self._tile_bounds
+        # Both projections act separately on x and y, so the edges of every
+        # tile can be computed in advance.
+        project, inv_scale = self.extent.project, self._inv_scale
+        xs = [project(x * inv_scale, 0)[0] for x in range(xtilemin, xtilemax + 2)]
+        ys = [project(0, y * inv_scale)[1] for y in range(ytilemin, ytilemax + 2)]
+        coords = [(x, y) for x in range(xtilemin, xtilemax + 1)
+            for y in range(ytilemin, ytilemax + 1)]
+        for (x, y), tile in zip(coords, self._get_tiles(coords)):
+            i, j = x - xtilemin, y - ytilemin
+            extent = (xs[i], xs[i + 1], ys[j + 1], ys[j])
+            ax.imshow(tile, interpolation="lanczos", extent=extent, **kwargs)
         ax.set(xlim = self.extent.xrange, ylim = self.extent.yrange)
 
     def as_one_image(self, allow_large = False):
@@ -466,15 +605,14 @@ class Plotter():
         if not allow_large:
             self._check_download_size()
         size = self._tile_provider.tilesize
-        xs = size * (self.xtilemax + 1 - self.xtilemin)
-        ys = size * (self.ytilemax + 1 - self.ytilemin)
+        xtilemin, xtilemax, ytilemin, ytilemax = self._tile_bounds
+        xs = size * (xtilemax + 1 - xtilemin)
+        ys = size * (ytilemax + 1 - ytilemin)
         out = _Image.new("RGBA", (xs, ys))
-        for x in range(self.xtilemin, self.xtilemax + 1):
-            for y in range(self.ytilemin, self.ytilemax + 1):
-                tile = self._tile_provider.get_tile(x, y, self.zoom)
-                xo = (x - self.xtilemin) * size
-                yo = (y - self.ytilemin) * size
-                out.paste(tile, (xo, yo))
+        coords = [(x, y) for x in range(xtilemin, xtilemax + 1)
+            for y in range(ytilemin, ytilemax + 1)]
+        for (x, y), tile in zip(coords, self._get_tiles(coords)):
+            out.paste(tile, ((x - xtilemin) * size, (y - ytilemin) * size))
         return out
 
     def plot(self, ax, allow_large = False, **kwargs):
@@ -489,9 +627,10 @@ class Plotter():
           matplotlib method.
         """
         tile = self.as_one_image(allow_large)
-        scale = 2 ** self.zoom
-        x0, y0 = self.extent.project(self.xtilemin / scale, self.ytilemin / scale)
-        x1, y1 = self.extent.project((self.xtilemax + 1) / scale, (self.ytilemax + 1) / scale)
+        inv_scale = self._inv_scale
+        xtilemin, xtilemax, ytilemin, ytilemax = self._tile_bounds
+        x0, y0 = self.extent.project(xtilemin * inv_scale, ytilemin * inv_scale)
+        x1, y1 = self.extent.project((xtilemax + 1) * inv_scale, (ytilemax + 1) * inv_scale)
         ax.imshow(tile, interpolation="lanczos", extent=(x0,x1,y1,y0), **kwargs)
         ax.set(xlim = self.extent.xrange, ylim = self.extent.yrange)
 
@@ -501,32 +640,40 @@ class Plotter():
 _NATIVE_LONLAT = 4326
 _WEB_MERCATOR = 3857
 
+# Map from EPSG code to the projection we treat it as
+_CRS_CODES = {4326 : _NATIVE_LONLAT, 3857 : _WEB_MERCATOR, 3785 : _WEB_MERCATOR}
+
 def _read_crs(crs):
-    try:
-        return crs["init"]
-    except:
-        pass
-    try:
-        return crs.srs
-    except:
-        pass
-    return None
+    if isinstance(crs, _collections_abc.Mapping):
+        # Old style `{"init" : "epsg:3857"}`
+        return crs.get("init")
+    return getattr(crs, "srs", None)
 
 def _parse_crs(crs):
     if crs is None:
         return _NATIVE_LONLAT
-    crs = _read_crs(crs)
-    if crs is None:    
+    # A :class:`pyproj.CRS` always has an `srs` string, but it need not be of
+    # the form "EPSG:xxxx" (e.g. WKT, or a PROJ string) so ask it first.
+    to_epsg = getattr(crs, "to_epsg", None)
+    code = None if to_epsg is None else to_epsg()
+    if code is not None:
+        if code not in _CRS_CODES:
+            raise ValueError("Unsupported projection 'EPSG:{}'".format(code))
+        return _CRS_CODES[code]
+    crs_str = _read_crs(crs)
+    if crs_str is None:
         raise ValueError("Unknown crs data: '{}'".format(crs))
-    parts = crs.split(":")
-    if parts[0].upper() != "EPSG":
+    return _parse_crs_str(crs_str)
+
+@_functools.lru_cache(maxsize=32)
+def _parse_crs_str(crs):
+    prefix, _, code = crs.partition(":")
+    if prefix.upper() != "EPSG" or not code.isdigit():
         raise ValueError("Unknown projection '{}'".format(crs))
-    code = int(parts[1])
-    if code == _NATIVE_LONLAT:
-        return _NATIVE_LONLAT
-    if code == 3857 or code == 3785:
-        return _WEB_MERCATOR
-    raise ValueError("Unsupported projection '{}'".format(crs))
+    code = int(code)
+    if code not in _CRS_CODES:
+        raise ValueError("Unsupported projection '{}'".format(crs))
+    return _CRS_CODES[code]
 
 def extent_from_frame(frame, buffer=0):
     """Minimal interface to compute an :class:`Extent` from a geoPandas
@@ -544,8 +691,8 @@ def extent_from_frame(frame, buffer=0):
     proj = _parse_crs(frame.crs)
     bounds = frame.total_bounds
     if proj == _WEB_MERCATOR:
-        minimum = to_lonlat(*_from_3857(bounds[0], bounds[1]))
-        maximum = to_lonlat(*_from_3857(bounds[2], bounds[3]))
+        minimum = _3857_to_lonlat(bounds[0], bounds[1])
+        maximum = _3857_to_lonlat(bounds[2], bounds[3])
         bounds = [minimum[0], minimum[1], maximum[0], maximum[1]]
 
     width, height = bounds[2] - bounds[0], bounds[3] - bounds[1]
@@ -559,6 +706,18 @@ def extent_from_frame(frame, buffer=0):
         return e.to_project_3857()
     return e
 
+def _point_coordinates(geometry):
+    """Return an array of shape `(N,2)` of the first, x/y coordinate of each
+    geometry.  Requires :mod:`numpy`, and uses :mod:`shapely` if that is
+    available and every geometry is a point."""
+    if _get_coordinates is not None:
+        geoms = _np.asarray(geometry, dtype=object)
+        # Type id 0 is a Point; other types have more than one coordinate
+        if _np.all(_get_type_id(geoms) == 0):
+            return _get_coordinates(geoms)
+    return _np.array([point.coords[0][:2] for point in geometry],
+        dtype=float).reshape(-1, 2)
+
 def points_from_frame(frame):
     """Takes the geometry from the passed data frame, looks for point objects
     and extracts the coordinates.  Useful for ploting, as doing this is usually
@@ -577,17 +736,17 @@ def points_from_frame(frame):
     :return: Pair (x,y) of lists of coordinates.
     """
     proj = _parse_crs(frame.crs)
-    xcs, ycs = [], []
+    if _np is not None:
+        coords = _point_coordinates(frame.geometry)
+        xcs, ycs = coords[:,0], coords[:,1]
+        if proj == _NATIVE_LONLAT:
+            xcs, ycs = project_array(xcs, ycs)
+        return xcs.tolist(), ycs.tolist()
+
+    coords = [point.coords[0] for point in frame.geometry]
     if proj == _NATIVE_LONLAT:
-        for point in frame.geometry:
-            c = project(*point.coords[0])
-            xcs.append(c[0])
-            ycs.append(c[1])
-    else:
-        for point in frame.geometry:
-            xcs.append(point.coords[0][0])
-            ycs.append(point.coords[0][1])
-    return xcs, ycs
+        coords = [project(*c) for c in coords]
+    return [c[0] for c in coords], [c[1] for c in coords]
 
 
 ##### (Optional) usage of pyproj
@@ -597,21 +756,20 @@ try:
 except:
     _pyproj = None
 
-if _pyproj is not None:
-    _proj3857 = _pyproj.CRS("EPSG:3857")
-    _proj3785 = _pyproj.CRS("EPSG:3785")
-    _proj4326 = _pyproj.CRS("epsg:4326")
-    _proj_to_3857 = _pyproj.Transformer.from_crs(_proj4326, _proj3857).transform
-    _proj_to_3785 = _pyproj.Transformer.from_crs(_proj4326, _proj3785).transform
+@_functools.lru_cache(maxsize=None)
+def _transformer(target):
+    """The `transform` method of a :mod:`pyproj` transformer from EPSG:4326 to
+    `target`.  Built on first use, as constructing a `Transformer` is slow."""
+    return _pyproj.Transformer.from_crs("EPSG:4326", target, always_xy=True).transform
 
 def project_3785(longitude, latitude):
-    """Project using :module:`pyproj` and EPSG:3785."""
-    global _proj_to_3857
-    xx, yy = _proj_to_3857(latitude, longitude)
+    """Project using :module:`pyproj` and EPSG:3785.  Also accepts arrays of
+    coordinates, which are transformed in one call."""
+    xx, yy = _transformer("EPSG:3785")(longitude, latitude)
     return _from_3857(xx, yy)
 
 def project_3857(longitude, latitude):
-    """Project using :module:`pyproj` and EPSG:3857."""
-    global _proj_to_3785
-    xx, yy = _proj_to_3785(latitude, longitude)
+    """Project using :module:`pyproj` and EPSG:3857.  Also accepts arrays of
+    coordinates, which are transformed in one call."""
+    xx, yy = _transformer("EPSG:3857")(longitude, latitude)
     return _from_3857(xx, yy)
@@ -52,6 +52,7 @@ typical usage is:
 """
 
 import math as _math
+import functools as _functools
 import os as _os
 import re as _re
 import PIL.Image as _Image
@@ -60,6 +61,12 @@ _Image.MAX_IMAGE_PIXELS = 91000000
 from .mapping import _BaseExtent
 from .utils import Cache as _Cache
 
+# Optional, for vectorised conversions
+try:
+    import numpy as _np
+except:
+    _np = None
+
 # Singletons
 _lookup = None
 
@@ -76,37 +83,60 @@ def init(start_directory):
         MiniScale.name : {},
         OverView.name : {} }
     if not isinstance(start_directory, str):
-        dirs = list(start_directory)
+        dirs = [_os.path.abspath(d) for d in start_directory]
     else:
-        dirs = [start_directory]
+        dirs = [_os.path.abspath(start_directory)]
     while len(dirs) > 0:
         dirname = dirs.pop()
         dirs.extend(_init_scan_one_directory(dirname))
 
+# Filename patterns for the tile sets, matched against the whole name
+_OML_RE = _re.compile(r"[A-Z]{2}\d\d[NESW]{2}\.tif")
+_VML_RE = _re.compile(r"[A-Z]{2}\d\d\.tif")
+_TFK_RE = _re.compile(r"[A-Z]{2}\.tif")
+_MINI_RE = _re.compile(r"MiniScale.*\.tif")
+_OVER_RE = _re.compile(r"GBOver.*\.tif")
+
 def _init_scan_one_directory(dir_name):
+    """Scan the absolute path `dir_name`, returning its sub-directories."""
     global _lookup
-    oml = _re.compile(r"^[A-Z]{2}\d\d[NESW]{2}\.tif$")
-    vml = _re.compile(r"^[A-Z]{2}\d\d\.tif$")
-    tfk = _re.compile(r"^[A-Z]{2}\.tif$")
-    mini = _re.compile(r"^MiniScale.*\.tif$")
-    over = _re.compile(r"^GBOver.*\.tif$")
-    dirs = []
-    dir_name = _os.path.abspath(dir_name)
+    dirs, filenames = _list_directory(dir_name)
+    for name in filenames:
+        if _OML_RE.fullmatch(name):
+            _lookup[OpenMapLocal.name][name[:2]] = dir_name
+        elif _VML_RE.fullmatch(name):
+            _lookup[VectorMapDistrict.name][name[:2]] = dir_name
+        elif _TFK_RE.fullmatch(name):
+            _lookup[TwoFiftyScale.name] = dir_name
+        elif _MINI_RE.fullmatch(name):
+            _lookup[MiniScale.name][name] = dir_name
+        elif _OVER_RE.fullmatch(name):
+            _lookup[OverView.name][name] = dir_name
+    return list(dirs)
+
+def _list_directory(dir_name):
+    """List the directory, returning a pair `(dirs, filenames)` where `dirs` are
+    the absolute paths of sub-directories.  Results are cached, keyed by the
+    modification time of the directory, so repeated scans of an unchanged
+    directory make only one system call."""
+    try:
+        mtime = _os.stat(dir_name).st_mtime_ns
+    except OSError:
+        return _scan_directory(dir_name)
+    return _cached_scan_directory(dir_name, mtime)
+
+@_functools.lru_cache(maxsize=256)
+def _cached_scan_directory(dir_name, mtime):
+    return _scan_directory(dir_name)
+
+def _scan_directory(dir_name):
+    dirs, filenames = [], []
     for entry in _os.scandir(dir_name):
         if entry.is_dir():
             dirs.append(_os.path.abspath(entry.path))
         elif entry.is_file():
-            if oml.match(entry.name):
-                _lookup[OpenMapLocal.name][entry.name[:2]] = dir_name
-            elif vml.match(entry.name):
-                _lookup[VectorMapDistrict.name][entry.name[:2]] = dir_name
-            elif tfk.match(entry.name):
-                _lookup[TwoFiftyScale.name] = dir_name
-            elif mini.match(entry.name):
-                _lookup[MiniScale.name][entry.name] = dir_name
-            elif over.match(entry.name):
-                _lookup[OverView.name][entry.name] = dir_name
-    return dirs
+            filenames.append(entry.name)
+    return tuple(dirs), tuple(filenames)
 
 def to_os_national_grid(longitude, latitude):
     """Converts the longitude and latitude coordinates to the Ordnance Survery
@@ -127,20 +157,11 @@ def _code_grid_residual(longitude, latitude):
         raise ValueError()
     
 def _coords_to_code_grid_residual(x, y):
-    codes = "ABCDEFGHJKLMNOPQRSTUVWXYZ"
-    x500, y500 = _math.floor(x / 500000), _math.floor(y / 500000)
-    index = (2 + x500) + (3 - y500) * 5
-    if index < 0 or index >= 25:
-        raise ValueError("Coordinates out of range of National Grid.")
-    grid_code = codes[index]
-    
-    x, y = x - 500000 * x500, y - 500000 * y500
     x100, y100 = _math.floor(x / 100000), _math.floor(y / 100000)
-    index = x100 + (4 - y100) * 5
-    if index < 0 or index >= 25:
-        raise AssertionError()
-    grid_code += codes[index]
-
+    try:
+        grid_code = _GRID_CODES[(x100, y100)]
+    except KeyError:
+        raise ValueError("Coordinates out of range of National Grid.")
     return grid_code, x - x100 * 100000, y - y100 * 100000
 
 def coords_to_os_national_grid(x, y):
@@ -151,20 +172,122 @@ def coords_to_os_national_grid(x, y):
     xx, yy = _math.floor(x), _math.floor(y)
     return "{} {} {}".format(grid_code, xx, yy)
 
+_GRID_LETTERS = "ABCDEFGHJKLMNOPQRSTUVWXYZ"
+
+def _build_grid_offsets():
+    offsets = dict()
+    for index0, first in enumerate(_GRID_LETTERS):
+        x500, y500 = (index0 % 5) - 2, 3 - (index0 // 5)
+        for index1, second in enumerate(_GRID_LETTERS):
+            x100, y100 = (index1 % 5), 4 - (index1 // 5)
+            offsets[first + second] = (500000 * x500 + 100000 * x100,
+                500000 * y500 + 100000 * y100)
+    return offsets
+
+# Map from two letter grid code to the coordinates of its lower left corner
+_GRID_OFFSETS = _build_grid_offsets()
+
+# The inverse: map from the 100km square `(x // 100000, y // 100000)` to its
+# two letter grid code
+_GRID_CODES = {(x // 100000, y // 100000) : code
+    for code, (x, y) in _GRID_OFFSETS.items()}
+
+# Separated by single spaces, as `str.split(" ")` used to require.  The
+# numbers are ASCII digits only: no signs, underscores or whitespace, which
+# `int` would accept.
+_GRID_REFERENCE = _re.compile(r"([A-Z]{2}) ([0-9]+) ([0-9]+)")
+
 def os_national_grid_to_coords(grid_position):
     """Convert a OS national grid reference like `SE 29383 34363` to
     coordinates, e.g. `(429383, 434363)`."""
-    try:
-        code, x, y = grid_position.split(" ")
-        x, y = int(x), int(y)
-        codes = "ABCDEFGHJKLMNOPQRSTUVWXYZ"
-        index0 = codes.index(code[0])
-        x500, y500 = (index0 % 5) - 2, 3 - (index0 // 5)
-        index1 = codes.index(code[1])
-        x100, y100 = (index1 % 5), 4 - (index1 // 5)
-        return 500000 * x500 + 100000 * x100 + x, 500000 * y500 + 100000 * y100 + y
-    except:
+    match = None
+    if isinstance(grid_position, str):
+        match = _GRID_REFERENCE.fullmatch(grid_position)
+    if match is None or match.group(1) not in _GRID_OFFSETS:
         raise ValueError("Should be a grid reference like 'SE 12345 12345'.")
+    code, x, y = match.groups()
+    xoffset, yoffset = _GRID_OFFSETS[code]
+    return xoffset + int(x), yoffset + int(y)
+
+def _build_grid_offset_table():
+    # Indexed by `26 * first + second` where the letters are numbered 0 to 25
+    xoffsets = _np.zeros(26 * 26, dtype=_np.int64)
+    yoffsets = _np.zeros(26 * 26, dtype=_np.int64)
+    valid = _np.zeros(26 * 26, dtype=bool)
+    for code, (x, y) in _GRID_OFFSETS.items():
+        index = 26 * (ord(code[0]) - 65) + ord(code[1]) - 65
+        xoffsets[index], yoffsets[index], valid[index] = x, y, True
+    return xoffsets, yoffsets, valid
+
+_GRID_OFFSET_TABLE = None if _np is None else _build_grid_offset_table()
+
+def _build_grid_code_table():
+    # Indexed by the 100km square, offset to start at the false origin
+    codes = _np.zeros((25, 25), dtype="U2")
+    for (x100, y100), code in _GRID_CODES.items():
+        codes[x100 + 10, y100 + 5] = code
+    return codes
+
+_GRID_CODE_TABLE = None if _np is None else _build_grid_code_table()
+
+def _coords_to_code_grid_residual_many(x, y):
+    x100, y100 = _np.floor(x / 100000), _np.floor(y / 100000)
+    ix, iy = x100 + 10, y100 + 5
+    # Also rejects NaN, for which every comparison is False
+    if not _np.all((ix >= 0) & (ix < 25) & (iy >= 0) & (iy < 25)):
+        raise ValueError("Coordinates out of range of National Grid.")
+    codes = _GRID_CODE_TABLE[ix.astype(int), iy.astype(int)]
+    return codes.tolist(), x - x100 * 100000, y - y100 * 100000
+
+def to_os_national_grid_many(longitudes, latitudes):
+    """Vectorised version of :func:`to_os_national_grid`, which requires
+    :mod:`numpy`.  All the points are projected with a single call to
+    :mod:`pyproj`.
+
+    :param longitudes: Array of longitudes.
+    :param latitudes: Array of latitudes, of the same length.
+
+    :return: Triple `(grid_codes, eastings, northings)` where `grid_codes` is
+      a list of references like "SE 29383 34363" and `eastings` and
+      `northings` are arrays of the residual coordinates in the range [0, 1).
+    """
+    longitudes = _np.asarray(longitudes, dtype=float).reshape(-1)
+    latitudes = _np.asarray(latitudes, dtype=float).reshape(-1)
+    x, y = project(longitudes, latitudes)
+    codes, x, y = _coords_to_code_grid_residual_many(_np.asarray(x), _np.asarray(y))
+    xx, yy = _np.floor(x), _np.floor(y)
+    grid_codes = ["{} {} {}".format(*t) for t in
+        zip(codes, xx.astype(int).tolist(), yy.astype(int).tolist())]
+    return grid_codes, x - xx, y - yy
+
+def os_national_grid_to_coords_many(grid_positions):
+    """Vectorised version of :func:`os_national_grid_to_coords`, which requires
+    :mod:`numpy`.  References in the standard form "SE 29383 34363" are parsed
+    in bulk; any others are passed to :func:`os_national_grid_to_coords`.
+
+    :param grid_positions: Iterable of OS national grid references.
+
+    :return: Pair `(xs, ys)` of integer arrays.
+    """
+    grid_positions = list(grid_positions)
+    # Unicode code points, padded with zeros, one row per reference
+    chars = _np.array(grid_positions, dtype="U15").reshape(-1)
+    chars = chars.view(_np.uint32).reshape(len(grid_positions), 15).astype(_np.int64)
+    letters = chars[:, :2] - ord("A")
+    digits = chars[:, [3,4,5,6,7,9,10,11,12,13]] - ord("0")
+    ok = ( (chars[:, 2] == ord(" ")) & (chars[:, 8] == ord(" ")) & (chars[:, 14] == 0)
+        & _np.all((letters >= 0) & (letters < 26), axis=1)
+        & _np.all((digits >= 0) & (digits <= 9), axis=1) )
+    index = _np.where(ok, 26 * letters[:, 0] + letters[:, 1], 0)
+    xoffsets, yoffsets, valid = _GRID_OFFSET_TABLE
+    ok &= valid[index]
+
+    powers = _np.array([10000, 1000, 100, 10, 1])
+    xs = xoffsets[index] + digits[:, :5] @ powers
+    ys = yoffsets[index] + digits[:, 5:] @ powers
+    for i in _np.nonzero(~ok)[0]:
+        xs[i], ys[i] = os_national_grid_to_coords(grid_positions[i])
+    return xs, ys
 
 
 ##### Tile providers #####
@@ -227,6 +350,8 @@ class OpenMapLocal(TileSource):
     """
     def __init__(self):
         super().__init__()
+        # Map from `(code, x, y)` of the tile to the full path of its file
+        self._paths = dict()
 
     name = "openmap_local"
 
@@ -244,21 +369,16 @@ class OpenMapLocal(TileSource):
             raise ValueError("{} appears not to be a valid national grid reference".format(grid_position))
         if code not in self._source:
             raise TileNotFoundError("No tiles loaded for square {}".format(code))
-        dirname = self._source[code]
-        squarex = _math.floor(x / 10000)
-        squarey = _math.floor(y / 10000)
-        x -= squarex * 10000
-        y -= squarey * 10000
-        if x < 5000 and y < 5000:
-            part = "SW"
-        elif x < 5000 and y >= 5000:
-            part = "NW"
-        elif x >= 5000 and y < 5000:
-            part = "SE"
-        else:
-            part = "NE"
-        filename = "{}{}{}{}.tif".format(code, squarex, squarey, part)
-        return _Image.open(_os.path.join(dirname, filename))
+        key = (code, x // 5000, y // 5000)
+        path = self._paths.get(key)
+        if path is None:
+            squarex, x = divmod(x, 10000)
+            squarey, y = divmod(y, 10000)
+            part = ("S" if y < 5000 else "N") + ("W" if x < 5000 else "E")
+            filename = "{}{}{}{}.tif".format(code, squarex, squarey, part)
+            path = _os.path.join(self._source[code], filename)
+            self._paths[key] = path
+        return _Image.open(path)
 
     @property
     def tilesize(self):
@@ -275,6 +395,8 @@ class VectorMapDistrict(TileSource):
     """
     def __init__(self):
         super().__init__()
+        # Map from `(code, x, y)` of the tile to the full path of its file
+        self._paths = dict()
 
     name = "vectormap_district"
 
@@ -292,13 +414,13 @@ class VectorMapDistrict(TileSource):
             raise ValueError("{} appears not to be a valid national grid reference".format(grid_position))
         if code not in self._source:
             raise TileNotFoundError("No tiles loaded for square {}".format(code))
-        dirname = self._source[code]
-        squarex = _math.floor(x / 10000)
-        squarey = _math.floor(y / 10000)
-        x -= squarex * 10000
-        y -= squarey * 10000
-        filename = "{}{}{}.tif".format(code, squarex, squarey)
-        return _Image.open(_os.path.join(dirname, filename))
+        key = (code, x // 10000, y // 10000)
+        path = self._paths.get(key)
+        if path is None:
+            filename = "{}{}{}.tif".format(*key)
+            path = _os.path.join(self._source[code], filename)
+            self._paths[key] = path
+        return _Image.open(path)
 
     @property
     def tilesize(self):
@@ -342,6 +464,7 @@ class _SingleFileSource(TileSource):
         self._filenames = list(self._source.keys())
         self._filename = self._filenames[0]
         self._cache_image = None
+        self._tiles = None
 
     @property
     def filename(self):
@@ -357,6 +480,19 @@ class _SingleFileSource(TileSource):
         """List of all available filenames."""
         return self._filenames
 
+    @property
+    def tile_cache_size(self):
+        """The number of cropped tiles to keep in memory, so that repeated
+        requests for the same tile do not crop the image again.  Defaults to
+        0, no caching.  Each MiniScale tile is around 3MB once decoded, so
+        keep this small.  A cached tile is returned as the same object every
+        time, so treat returned tiles as read-only."""
+        return 0 if self._tiles is None else self._tiles._maxcount
+
+    @tile_cache_size.setter
+    def tile_cache_size(self, v):
+        self._tiles = _Cache(v) if v > 0 else None
+
     def _get_image(self):
         filename = _os.path.join(self._source[self._filename], self._filename)
         if self._cache_image is not None and self._cache_image[0] == filename:
@@ -366,6 +502,18 @@ class _SingleFileSource(TileSource):
             self._cache_image = (filename, image)
         return image
 
+    def _get_tile(self, box):
+        """Crop the box from the current image, using the cache of tiles if
+        :attr:`tile_cache_size` is set."""
+        if self._tiles is None:
+            return self._get_image().crop(box)
+        key = (self._filename, box)
+        tile = self._tiles.get(key)
+        if tile is None:
+            tile = self._get_image().crop(box)
+            self._tiles[key] = tile
+        return tile
+
 
 class MiniScale(_SingleFileSource):
     """Uses tiles from the MiniScale collection,
@@ -384,7 +532,7 @@ class MiniScale(_SingleFileSource):
         x, y = os_national_grid_to_coords(grid_position)
         tx = _math.floor(x / 100000) * 1000
         ty = 13000 - _math.floor(y / 100000) * 1000
-        return self._get_image().crop((tx, ty-1000, tx+1000, ty))
+        return self._get_tile((tx, ty-1000, tx+1000, ty))
 
     @property
     def tilesize(self):
@@ -416,7 +564,7 @@ class OverView(_SingleFileSource):
         x, y = os_national_grid_to_coords(grid_position)
         tx = _math.floor(x / self.size_in_meters) * self._tilesize + 1300
         ty = 2900 - _math.floor(y / self.size_in_meters) * self._tilesize
-        return self._get_image().crop((tx, ty - self._tilesize, tx + self._tilesize, ty))
+        return self._get_tile((tx, ty - self._tilesize, tx + self._tilesize, ty))
 
     @property
     def tilesize(self):
@@ -438,14 +586,19 @@ class OverView(_SingleFileSource):
 
 
 def _separate_init(matcher, start_directory, callback):
-    directories = [start_directory]
+    """Recursively scan `start_directory` calling `callback(filename, dir_name)`
+    for each file whose name matches the compiled regular expression
+    `matcher`."""
+    match = matcher.match
+    # Sub-directories from `_list_directory` are already absolute paths
+    directories = [_os.path.abspath(start_directory)]
     while len(directories) > 0:
-        dir_name = _os.path.abspath(directories.pop())
-        for entry in _os.scandir(dir_name):
-            if entry.is_dir():
-                directories.append(_os.path.abspath(entry.path))
-            elif entry.is_file() and matcher.match(entry.name):
-                callback(entry.name, dir_name)
+        dir_name = directories.pop()
+        dirs, filenames = _list_directory(dir_name)
+        directories.extend(dirs)
+        for name in filenames:
+            if match(name):
+                callback(name, dir_name)
 
 
 class TwentyFiveRaster(TileSource):
@@ -460,6 +613,8 @@ class TwentyFiveRaster(TileSource):
 
     name = "25k_raster"
 
+    _matcher = _re.compile(r"^[a-z]{2}\d\d\.tif$")
+
     @staticmethod
     def found_tiles():
         """A list of the "grid codes" we have tiles for."""
@@ -469,12 +624,11 @@ class TwentyFiveRaster(TileSource):
     @staticmethod
     def init(start_directory):
         """Scan a directory for suitable tiles."""
-        matcher = _re.compile(r"^[a-z]{2}\d\d\.tif$")
         global _lookup
         _lookup[TwentyFiveRaster.name] = dict()
         def callback(filename, dir_name):
             _lookup[TwentyFiveRaster.name][filename[:2].upper()] = dir_name
-        _separate_init(matcher, start_directory, callback)
+        _separate_init(TwentyFiveRaster._matcher, start_directory, callback)
 
     def __call__(self, grid_position):
         try:
@@ -509,9 +663,16 @@ class MasterMap(TileSource):
     def __init__(self):
         super().__init__()
         self.tilesize = 3200
+        # Map from upper-case filename (without extension) to `(dir_name, filename)`
+        self._index = dict()
+        for dir_name, files in self._source.items():
+            for f in files:
+                self._index.setdefault(f.split(".")[0].upper(), (dir_name, f))
 
     name = "MasterMap"
 
+    _matcher = _re.compile(r"^[A-Za-z]{2}\d{4}\.(tif|png)$")
+
     @staticmethod
     def found_tiles():
         """A list of the tiles we have.  At least as my institution provides
@@ -532,7 +693,6 @@ class MasterMap(TileSource):
     @staticmethod
     def init(start_directory):
         """Scan a directory for suitable tiles."""
-        matcher = _re.compile(r"^[A-Za-z]{2}\d{4}\.(tif|png)$")
         global _lookup
         _lookup[MasterMap.name] = dict()
         def callback(filename, dir_name):
@@ -540,16 +700,13 @@ class MasterMap(TileSource):
             if dir_name not in d:
                 d[dir_name] = []
             d[dir_name].append(filename)
-        _separate_init(matcher, start_directory, callback)
+        _separate_init(MasterMap._matcher, start_directory, callback)
 
     def _find_filename(self, filename):
-        global _lookup
-        for dir_name, files in _lookup[MasterMap.name].items():
-            for f in files:
-                fn = f.split(".")[0]
-                if fn.upper() == filename.upper():
-                    return dir_name, f
-        raise TileNotFoundError("No file found matching '{}'".format(filename))
+        try:
+            return self._index[filename.upper()]
+        except KeyError:
+            raise TileNotFoundError("No file found matching '{}'".format(filename))
 
     def __call__(self, grid_position):
         try:
@@ -640,15 +797,20 @@ class TileScalar(TileSource):
     
     :param source: The parent :class:`TileSource`.
     :param newsize: The size of the tiles to be generated.
+    :param cachesize: The number of resized tiles to cache.  Should be at least
+      the number of tiles in a typical plot, else redrawing the same region
+      will resize every tile again.
     """
-    def __init__(self, source, newsize):
+    def __init__(self, source, newsize, cachesize=64):
         self._delegate = source
         self._size = newsize
-        self._cache = _Cache(16)
+        self._cache = _Cache(cachesize)
 
     def __call__(self, grid_position):
-        if grid_position in self._cache:
+        try:
             return self._cache[grid_position]
+        except KeyError:
+            pass
         tile = self._delegate(grid_position)
         tile = tile.convert("RGB").resize((self.tilesize, self.tilesize), _Image.LANCZOS)
         self._cache[grid_position] = tile
@@ -681,9 +843,10 @@ class Extent(_BaseExtent):
     :param ymin:
     :param ymax: The range of the y coordinates.
     """
+    __slots__ = ()
+
     def __init__(self, xmin, xmax, ymin, ymax):
         super().__init__(xmin, xmax, ymin, ymax)
-        self.project = self._project
 
     @property
     def yrange(self):
@@ -699,6 +862,16 @@ class Extent(_BaseExtent):
         xmin, xmax, ymin, ymax = _BaseExtent.from_centre(x, y, xsize, ysize, aspect)
         return Extent(xmin, xmax, ymin, ymax)
 
+    @staticmethod
+    def from_centres(x, y, xsize=None, ysize=None, aspect=1.0):
+        """As :meth:`from_centre`, but for arrays of centres (and optionally
+        sizes).  The arithmetic is vectorised with :mod:`numpy`.
+
+        :return: List of new instances.
+        """
+        bounds = _BaseExtent.from_centres(x, y, xsize, ysize, aspect)
+        return [Extent(*b) for b in zip(*(a.tolist() for a in bounds))]
+
     @staticmethod
     def from_centre_lonlat(longitude, latitude, xsize=None, ysize=None, aspect=1.0):
         """Construct a new instance centred on the given location with a given
@@ -729,6 +902,8 @@ class Extent(_BaseExtent):
         # For compatibility with the base class
         return x, y
 
+    project = _project
+
     def __repr__(self):
         return "Extent(({},{})->({},{}) in OS National Grid)".format(self.xmin,
                 self.ymin, self.xmax, self.ymax)
@@ -779,15 +954,6 @@ class Extent(_BaseExtent):
         dy = dy * (self._ymax - self._ymin)
         return self.with_absolute_translation(dx, dy)
 
-    def with_scaling(self, scale):
-        """Return a new instance with the same midpoint, but with the width/
-        height divided by `scale`.  So `scale=2` will zoom in."""
-        midx = (self._xmin + self._xmax) / 2
-        midy = (self._ymin + self._ymax) / 2
-        xs = (self._xmax - self._xmin) / scale / 2
-        ys = (self._ymax - self._ymin) / scale / 2
-        return Extent(midx - xs, midx + xs, midy - ys, midy + ys , self._project_str)
-
     def with_scaling(self, scale):
         """Return a new instance with the same midpoint, but with the width/
         height divided by `scale`.  So `scale=2` will zoom in."""
@@ -802,6 +968,8 @@ class Plotter():
     :param source: Instance of :class:`TileSource` giving the source of tiles.
     :param ignore_errors: If `True` then ignore errors on finding tiles.
     """
+    __slots__ = ("_extent", "_source", "_ignore_errors")
+
     def __init__(self, extent, source, ignore_errors=True):
         self._extent = extent
         self._source = source
@@ -854,16 +1022,16 @@ class Plotter():
         """
         xs, xe = self._quant(self._extent.xmin), self._quant(self._extent.xmax)
         ys, ye = self._quant(self._extent.ymin), self._quant(self._extent.ymax)
-        xsize = (1 + xe - xs) * self._source.tilesize
-        ysize = (1 + ye - ys) * self._source.tilesize
+        tilesize = self._source.tilesize
+        xsize = (1 + xe - xs) * tilesize
+        ysize = (1 + ye - ys) * tilesize
         out = _Image.new("RGB", (xsize, ysize))
         for x in range(xs, xe+1):
+            xx, xo = self._unquant(x), (x - xs) * tilesize
             for y in range(ys, ye+1):
-                xx, yy = self._unquant(x), self._unquant(y)
+                yy = self._unquant(y)
                 code = coords_to_os_national_grid(xx + 0.5, yy + 0.5)
-                tile = self._get(code)
-                xo, yo = (x - xs) * self._source.tilesize, (ye - y) * self._source.tilesize
-                out.paste(tile, (xo, yo))
+                out.paste(self._get(code), (xo, (ye - y) * tilesize))
         return out
 
     def plot(self, ax, **kwargs):
@@ -893,18 +1061,25 @@ try:
 except:
     _pyproj = None
 
-if _pyproj is not None:
-    _wgs84 = _pyproj.CRS("EPSG:4326")
-    _bng = _pyproj.CRS("EPSG:27700")
-    _bng_transformer = _pyproj.Transformer.from_crs("EPSG:4326", "EPSG:27700").transform
-    _bng_inv_transformer = _pyproj.Transformer.from_crs("EPSG:27700", "EPSG:4326").transform
-    
+@_functools.lru_cache(maxsize=None)
+def _transformer(source, target):
+    """The `transform` method of a :mod:`pyproj` transformer, built on first
+    use as constructing a `Transformer` is slow."""
+    return _pyproj.Transformer.from_crs(source, target, always_xy=True).transform
+
 def project(longitude, latitude):
-    global _bng_transformer
-    return _bng_transformer(latitude, longitude)
+    """Project longitude / latitude to OS National Grid coordinates, using
+    :mod:`pyproj`.  The coordinates may be scalars or (numpy) arrays; arrays
+    are projected in a single call, which is much faster than projecting
+    point by point.
+
+    :return: Pair `(x, y)` of the same type as the input.
+    """
+    return _transformer("EPSG:4326", "EPSG:27700")(longitude, latitude)
 
 def to_lonlat(x, y):
-    global _bng_inv_transformer
-    lat, lon = _bng_inv_transformer(x, y)
-    return (lon, lat)
-    
\ No newline at end of file
+    """Inverse of :func:`project`.  Again works with scalars or arrays.
+
+    :return: Pair `(longitude, latitude)`
+    """
+    return _transformer("EPSG:27700", "EPSG:4326")(x, y)
@@ -32,16 +32,24 @@ For other providers, copyright and usage rights may vary.
 """
 
 from . import cache as _cache
+from . import utils as _utils
 import os as _os
 import io as _io
 import requests as _requests
 import PIL.Image as _Image
 import logging as _logging
 import datetime as _datetime
+import concurrent.futures as _futures
+import string as _string
+import threading as _threading
 
 # Singleton
 _sqcache = None
 
+# Download thread pools, keyed by `max_workers`
+_pools = dict()
+_pools_lock = _threading.Lock()
+
 def init(cache_filename = None, create = False):
     """Initialise the cache.  To avoid spamming the tile server, we cache the
     resulting tiles.  We are a little paranoid, so by default, the package will
@@ -100,26 +108,46 @@ class Cache(_cache.ConcreteCache):
 
     @staticmethod
     def make_request_string(name, x, y, zoom):
-        return "{}#{}#{}#{}".format(name, x, y, zoom)
+        return f"{name}#{x}#{y}#{zoom}"
 
     @staticmethod
     def split_request_string(str_request):
-        name, x, y, zoom = str_request.split("#")
+        name, _, rest = str_request.partition("#")
+        x, _, rest = rest.partition("#")
+        y, _, zoom = rest.partition("#")
         return name, int(x), int(y), int(zoom)
 
+    @property
+    def removal_count(self):
+        return self._delegate.removal_count
+
     def get_from_cache(self, key):
         return self._delegate.get_from_cache(self.make_request_string(*key))
 
+    def get_many(self, keys):
+        make = self.make_request_string
+        str_requests = {make(*key) : key for key in keys}
+        found = self._delegate.get_many(str_requests)
+        return {str_requests[str_request] : cached for str_request, cached in found.items()}
+
     def place_in_cache(self, str_request, obj_as_bytes):
         raise NotImplementedError()
 
     def query(self):
-        return [(self.split_request_string(sr), ti) 
-            for (sr, ti) in self._delegate.query()]
+        split = self.split_request_string
+        return [(split(sr), ti) for (sr, ti) in self._delegate.query()]
+
+    def iter_query(self):
+        split = self.split_request_string
+        return ((split(sr), ti) for (sr, ti) in self._delegate.iter_query())
 
     def remove(self, key):
         self._delegate.remove(self.make_request_string(*key))
 
+    def remove_many(self, keys):
+        make = self.make_request_string
+        self._delegate.remove_many([make(*key) for key in keys])
+
     def dump(self, dirname):
         """Dump all the files to the given directory.  The directory should
         be empty.  The directory structure will be:
@@ -133,39 +161,37 @@ class Cache(_cache.ConcreteCache):
         if _os.listdir(dirname) != []:
             raise Exception("Directory needs to be empty")
         
-        for (key, _) in self.query():
+        made_dirs = set()
+        for (key, _) in self.iter_query():
             name, x, y, zoom = key
-            filename = _os.path.join(dirname, name)
-            try:
-                _os.mkdir(filename)
-            except:
-                pass
-            filename = _os.path.join(filename, str(zoom))                
-            try:
-                _os.mkdir(filename)
-            except:
-                pass
+            filename = _os.path.join(dirname, name, str(zoom))
+            if filename not in made_dirs:
+                _os.makedirs(filename, exist_ok=True)
+                made_dirs.add(filename)
             data, _ = self.get_from_cache(key)
-            if data[:4] == b"\x89PNG":
-                ext = ".png"
-            elif data[6:10] == b"JFIF":
-                ext = ".jpg"
-            else:
-                ext = ""
-            filename = _os.path.join(filename, "{}_{}{}".format(x, y, ext))
+            filename = _os.path.join(filename, "{}_{}{}".format(x, y, self._sniff_extension(data)))
             with open(filename, "wb") as f:
                 f.write(data)
 
+    # Signatures of file types, from the first four bytes of the file
+    _EXTENSIONS = {b"\x89PNG": ".png", b"\xff\xd8\xff\xe0": ".jpg", b"\xff\xd8\xff\xe1": ".jpg"}
+
+    @staticmethod
+    def _sniff_extension(data):
+        ext = Cache._EXTENSIONS.get(bytes(data[:4]))
+        if ext is not None:
+            return ext
+        if data[6:10] == b"JFIF":
+            return ".jpg"
+        return ""
+
     def clean(self, cutoff):
         """Remove all files from the cache which were written before the
         cutoff.
 
         :param cutoff: Datetime
         """
-        query = list(self.query())
-        for (key, time) in query:
-            if time < cutoff:
-                self.remove(key)
+        self.remove_many([key for (key, time) in self.query() if time < cutoff])
 
 
 def get_cache():
@@ -173,21 +199,62 @@ def get_cache():
     return Cache(_get_cache())
 
 
+def _url_builder(template):
+    """Parse the URL template once, and return a callable `(x, y, zoom)` which
+    formats it.  The usual layout of `...{zoom}...{x}...{y}...` is specialised
+    to a single f-string; anything else falls back to `str.format`."""
+    parts = list(_string.Formatter().parse(template))
+    tail = parts.pop()[0] if parts and parts[-1][1] is None else ""
+    fields = [(field, spec, conversion) for _, field, spec, conversion in parts]
+    if fields == [("zoom", "", None), ("x", "", None), ("y", "", None)]:
+        a, b, c = [literal for literal, _, _, _ in parts]
+        return lambda x, y, zoom: f"{a}{zoom}{b}{x}{c}{y}{tail}"
+    return lambda x, y, zoom: template.format(x=x, y=y, zoom=zoom)
+
+def _get_pool(max_workers):
+    """A thread pool for downloading tiles, shared between calls.  Keeping the
+    worker threads alive also keeps their `requests.Session` objects, and so
+    their open connections to the tile servers."""
+    with _pools_lock:
+        pool = _pools.get(max_workers)
+        if pool is None:
+            pool = _futures.ThreadPoolExecutor(max_workers=max_workers,
+                thread_name_prefix="tilemapbase")
+            _pools[max_workers] = pool
+        return pool
+
+def _new_session():
+    session = _requests.Session()
+    # Pool connections to more hosts than the default of 10, as some providers
+    # spread tiles over a number of sub-domains.
+    adapter = _requests.adapters.HTTPAdapter(pool_connections=16)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
 class _TilesExecutor(_cache.Executor):
-    """Private class to run the HTTP request."""
+    """Private class to run the HTTP request.  Uses one :class:`requests.Session`
+    per thread, so that connections to the tile server are kept alive."""
     def __init__(self, parent):
         self.parent = parent
         self.logger = _logging.getLogger(__name__)
+        self._sessions = _utils.PerThreadProvider(_new_session)
+        self._sessions.set_destructor(lambda session: session.close())
+
+    # Seconds to wait for the server before giving up
+    timeout = 60
 
     def fetch(self, request):
         url = self.parent._request_http(request)
         self.logger.info("Requesting %s", url)
+        session = self._sessions.get()
         # TODO: I didn't understand the default value of headers.
         #       So not to rely on any, avoid setting it if unset.
         if self.parent.headers is not None:
-            response = _requests.get(url, headers=self.parent.headers)
+            response = session.get(url, headers=self.parent.headers, timeout=self.timeout)
         else:
-            response = _requests.get(url)
+            response = session.get(url, timeout=self.timeout)
         if not response.ok:
             raise IOError("Failed to download {}.  Got {}".format(url, response))
         try:
@@ -217,6 +284,7 @@ class Tiles():
         self._maxzoom = maxzoom
         self._tilesize = tilesize
         self._cache = None
+        self._url_builder = None
 
     def get_tile(self, x, y, zoom):
         """Attempt to fetch the tile at the specified coords and zoom level.
@@ -231,6 +299,9 @@ class Tiles():
           image object of the tile.
         """
         tile = self._get_cache().fetch(self._request_string(x, y, zoom))
+        return self._decode(tile, x, y, zoom)
+
+    def _decode(self, tile, x, y, zoom):
         if tile is None:
             return None
         try:
@@ -239,6 +310,26 @@ class Tiles():
         except:
             raise RuntimeError("Failed to decode data for {} - {}x{} @ {} zoom".format(self.name, x, y, zoom))
 
+    def get_tiles(self, coords, max_workers=8):
+        """Fetch many tiles.  The cache is searched for all the tiles at once,
+        tiles which are not in the cache are downloaded in parallel, and each
+        distinct tile is only requested once.
+
+        :param coords: Iterable of triples `(x, y, zoom)`, see :meth:`get_tile`.
+        :param max_workers: The maximum number of simultaneous downloads.
+
+        :return: List of tiles (or `None`), in the same order as `coords`.
+        """
+        coords = [tuple(c) for c in coords]
+        requests = [self._request_string(*key) for key in coords]
+        pool = _get_pool(max_workers)
+        data = self._get_cache().fetch_many(requests, mapper=pool.map)
+        images = dict()
+        for key, tile in zip(coords, data):
+            if key not in images:
+                images[key] = self._decode(tile, *key)
+        return [images[key] for key in coords]
+
     @property
     def maxzoom(self):
         """The maximum zoom level supported by this tile provider."""
@@ -255,11 +346,12 @@ class Tiles():
         return Cache.make_request_string(self.name, x, y, zoom)
 
     def _request_http(self, request_string):
-        parts = request_string.split("#")
-        if parts[0] != self.name:
-            raise ValueError("Build for '{}' but asked to decode '{}'".format(self.name, parts[0]))
-        x, y, zoom = [int(t) for t in parts[1:]]
-        return self.request.format(x=x, y=y, zoom=zoom)
+        name, x, y, zoom = Cache.split_request_string(request_string)
+        if name != self.name:
+            raise ValueError("Build for '{}' but asked to decode '{}'".format(self.name, name))
+        if self._url_builder is None or self._url_builder[0] != self.request:
+            self._url_builder = (self.request, _url_builder(self.request))
+        return self._url_builder[1](x, y, zoom)
 
     # Lazy initialisation
     def _get_cache(self):
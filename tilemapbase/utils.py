@@ -10,9 +10,13 @@ Some utility functions.
 """
 
 from collections import UserDict as _UserDict
+from collections import OrderedDict as _OrderedDict
+from collections import namedtuple as _namedtuple
 import bz2 as _bz2
 import PIL.Image as _Image
 import threading as _threading
+import weakref as _weakref
+import itertools as _itertools
 
 def start_logging():
     """Set the logging system to log to the (real) `stdout`.  Suitable for
@@ -30,6 +34,10 @@ def start_logging():
     logger.addHandler(ch)
 
 
+CacheInfo = _namedtuple("CacheInfo", ["hits", "misses", "maxsize", "currsize"])
+CacheInfo.__doc__ = """Statistics about a :class:`Cache`, in the same form as
+:func:`functools.lru_cache` reports."""
+
 class Cache(_UserDict):
     """Simple cache.  Implements the dictionary interface.  Objects are evicted
     from the cache by evicting the object least recently accessed.  Ties are
@@ -39,33 +47,46 @@ class Cache(_UserDict):
     """
     def __init__(self, maxcount=32):
         self._maxcount = maxcount
-        self._access_count = 0
-        self._accesses = {}
         super().__init__()
+        # Ordered from least to most recently accessed
+        self.data = _OrderedDict()
+        self._hits = 0
+        self._misses = 0
     
     def __setitem__(self, key, value):
-        if len(self.data) == self._maxcount and key not in self.data:
-            self._evict()
-        self._accesses[key] = self._access_count
-        self._access_count += 1
         self.data[key] = value
+        self.data.move_to_end(key)
+        while len(self.data) > self._maxcount:
+            self.data.popitem(last=False)
 
     def __getitem__(self, key):
-        self._accesses[key] = self._access_count
-        self._access_count += 1
-        return self.data[key]
+        try:
+            value = self.data[key]
+        except KeyError:
+            self._misses += 1
+            raise
+        self._hits += 1
+        self.data.move_to_end(key)
+        return value
 
     def __delitem__(self, key):
         del self.data[key]
-        del self._accesses[key]
 
-    def _evict(self):
-        toremove = -1
-        for key, value in self._accesses.items():
-            if toremove == -1 or toremove > value:
-                toremove = value
-                removekey = key
-        self.__delitem__(removekey)
+    def get(self, key, default=None):
+        # Explicitly via `__getitem__`, so that a miss is counted; from Python
+        # 3.12 `UserDict.get` tests membership first, and so would not be.
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def cache_info(self):
+        """Report hits and misses of item look-ups, by `[]` or :meth:`get`.
+        Membership tests with `in` are not counted.
+
+        :return: A :class:`CacheInfo` instance.
+        """
+        return CacheInfo(self._hits, self._misses, self._maxcount, len(self.data))
 
 class ImageCache(Cache):
     """A subclass of :class:`Cache` which supports compressing :mod:`Pillow`
@@ -74,72 +95,104 @@ class ImageCache(Cache):
     
     Any input object supporting a method `tobytes` will be compressed.  Any
     `bytes` object will be decompressed.
+
+    :param maxcount: The maximum number of objects to cache.
+    :param compress: If `False`, then images are not compressed, but a copy is
+      stored, and a copy returned on each access.  This is much faster, at the
+      expense of memory.
     """
-    def __init__(self, maxcount=32):
+    def __init__(self, maxcount=32, compress=True):
         super().__init__(maxcount)
+        self._compress = compress
 
     class _CompressedImage():
-        def __init__(self, mode, size, data):
+        def __init__(self, mode, size, data, palette=None):
             self.mode = mode
             self.size = size
             self.data = data
+            self.palette = palette
 
     def __setitem__(self, key, value):
+        if not self._compress:
+            if isinstance(value, _Image.Image):
+                value = value.copy()
+            return super().__setitem__(key, value)
         try:
             b = value.tobytes()
             assert isinstance(b, bytes)
+            palette = None
             if value.mode == "P":
-                b = b + bytes(value.getpalette())
-            data = _bz2.compress(b)
-            value = self._CompressedImage(value.mode, value.size, data)
+                palette = bytes(value.getpalette())
+            value = self._CompressedImage(value.mode, value.size, _bz2.compress(b), palette)
         except:
             pass
         super().__setitem__(key, value)
 
     def __getitem__(self, key):
         value = super().__getitem__(key)
-        if isinstance(value, self._CompressedImage):
-            image = _Image.new(value.mode, value.size)
-            data = _bz2.decompress(value.data)
-            if value.mode == "P":
-                pal = data[-768:]
-                image.putpalette(list(pal))
-                data = data[:-768]
-            image.frombytes(data)
+        if isinstance(value, _Image.Image):
+            value = value.copy()
+        elif isinstance(value, self._CompressedImage):
+            image = _Image.frombytes(value.mode, value.size, _bz2.decompress(value.data))
+            if value.palette is not None:
+                image.putpalette(value.palette)
             value = image
         return value
 
+class _ThreadToken():
+    """Stored in a :class:`threading.local`, so that it is freed when its
+    thread ends."""
+    pass
+
 class PerThreadProvider():
     """Using a Factory, provide objects for which there must be one per
     thread.  Contains caching and clean-up code.
+
+    Once a thread ends, its object is cleared (and the destructor invoked) on
+    the next call to :meth:`get` or :meth:`active_objects` from any thread.
     
     :param factory: A callable to be invoked to generate a new object.
     """
     def __init__(self, factory):
         self._factory = factory
+        self._local = _threading.local()
         self._cache = dict()
+        self._keys = _itertools.count()
+        # Keys of objects whose thread has ended; appended to by finalizers
+        self._dead = []
         self._desc = None
 
     def get(self):
         """Return a cached instance of the `object`, or if this is a new
         thread, build an new object and return it."""
-        self._clean()
-        our_id = _threading.get_ident() 
-        if our_id not in self._cache:
-            self._cache[our_id] = self._factory()
-        return self._cache[our_id]
+        if self._dead:
+            self._clean()
+        try:
+            return self._local.obj
+        except AttributeError:
+            pass
+        obj = self._factory()
+        key = next(self._keys)
+        token = _ThreadToken()
+        self._cache[key] = obj
+        _weakref.finalize(token, self._dead.append, key).atexit = False
+        self._local.token = token
+        self._local.obj = obj
+        return obj
 
     def _clean(self):
-        active_ids = {thread.ident for thread in _threading.enumerate()}
-        our_ids = set(self._cache.keys())
-        our_ids.difference_update(active_ids)
-        for thread_id in our_ids:
+        while True:
+            try:
+                key = self._dead.pop()
+            except IndexError:
+                return
+            obj = self._cache.pop(key)
             if self._desc is not None:
-                self._desc(self._cache[thread_id])
-            del self._cache[thread_id]
+                self._desc(obj)
 
     def active_objects(self):
         """List of active objects"""
+        self._clean()
         return list(self._cache.values())
 
     def set_destructor(self, destructor):